@@ -0,0 +1,397 @@
+import json
+import sys
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, abort, current_app, request, url_for
+from sqlalchemy import func, or_, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+try:
+	import orjson
+except ImportError:
+	orjson = None
+
+from forms import VenueForm, ArtistForm, ShowForm, form_from_dict
+from models import Venue, Artist, City, Genre, Show, Venue_genre, Artist_genre, db
+from pagination import paginate
+from routing import read_only
+from pagecache import page_cache
+from queries import db_search, db_create_venue, db_create_artist, db_create_show, db_delete, db_free_slots, is_booking_conflict, like_pattern, \
+	show_series, db_existing_ids, db_insert_shows, show_page_keys
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+#----------------------------------------------------------------------------#
+# Serialization.
+#----------------------------------------------------------------------------#
+
+def json_default(value):
+	if isinstance(value, datetime):
+		return value.isoformat()
+	raise TypeError('%r is not JSON serializable' % value)
+
+def dumps(payload):
+	if orjson is not None:
+		return orjson.dumps(payload, default=json_default).decode('utf-8')
+	return json.dumps(payload, default=json_default, separators=(',', ':'))
+
+def json_response(payload, status=200, headers=None):
+	return Response(dumps(payload), status=status, headers=headers, mimetype='application/json')
+
+# Registered per status code so they take precedence over the app's HTML
+# 404/500 handlers for errors raised inside the API.
+def http_error(error):
+	return json_response({'error': error.name, 'description': error.description}, error.code)
+
+for code in (400, 404, 409, 500):
+	api.register_error_handler(code, http_error)
+
+#----------------------------------------------------------------------------#
+# Resources.
+#----------------------------------------------------------------------------#
+
+# A resource maps public field names to column expressions, each optionally
+# needing a join. Queries select only the fields named in ?fields= (or the
+# defaults), plus any hidden sort-key columns pagination needs.
+class Resource(object):
+	def __init__(self, model, keys, fields, defaults, joins=None):
+		self.model = model
+		self.keys = keys
+		self.fields = fields
+		self.defaults = defaults
+		self.joins = joins or {}
+
+	# `names` defaults to the request's ?fields=.
+	def field_names(self, names=None):
+		if names is None:
+			names = request.args.get('fields')
+		if not names:
+			return self.defaults
+		names = list(dict.fromkeys(x.strip() for x in names.split(',') if x.strip()))
+		unknown = [x for x in names if x not in self.fields]
+		if unknown:
+			abort(400, 'Unknown fields: ' + ', '.join(unknown))
+		return names
+
+	def joins_for(self, names):
+		for join in dict.fromkeys(self.fields[name][1] for name in names):
+			if join is not None:
+				yield self.joins[join]
+
+	def query(self, names):
+		columns = [self.fields[name][0].label(name) for name in names]
+		columns += [key.label(key.key) for key in self.keys if key.key not in names]
+		query = db.session.query(*columns).select_from(self.model)
+		for target, onclause in self.joins_for(names):
+			query = query.join(target, onclause)
+		return query
+
+	# A Core statement rather than a Query so that the async mode (asgi.py)
+	# can run it too.
+	def detail_statement(self, names, entity_id):
+		statement = select(*[self.fields[name][0].label(name) for name in names]).select_from(self.model)
+		for target, onclause in self.joins_for(names):
+			statement = statement.join(target, onclause)
+		return statement.where(self.model.id == entity_id)
+
+	def page(self, query, names):
+		page = paginate(query, self.keys)
+		return json_response({
+			'data': [dict((name, getattr(row, name)) for name in names) for row in page],
+			'next': page.next_url,
+			'prev': page.prev_url,
+		})
+
+	def detail(self, entity_id):
+		names = self.field_names()
+		row = db.session.execute(self.detail_statement(names, entity_id)).first()
+		if row is None:
+			abort(404)
+		return json_response(dict((name, getattr(row, name)) for name in names))
+
+def genre_names(model, genre_table, genre_key):
+	return select(func.array_agg(Genre.name)) \
+		.join(genre_table, genre_table.c.genre_id == Genre.id) \
+		.where(genre_key == model.id).scalar_subquery()
+
+venues = Resource(Venue, [Venue.id], {
+	'id': (Venue.id, None),
+	'name': (Venue.name, None),
+	'address': (Venue.address, None),
+	'city': (City.name, 'city'),
+	'state': (City.state, 'city'),
+	'phone': (Venue.phone, None),
+	'website': (Venue.website, None),
+	'facebook_link': (Venue.facebook_link, None),
+	'image_link': (Venue.image_link, None),
+	'seeking_talent': (Venue.seeking_talent, None),
+	'seeking_description': (Venue.seeking_description, None),
+	'genres': (genre_names(Venue, Venue_genre, Venue_genre.c.venue_id), None),
+	'updated_at': (Venue.updated_at, None),
+}, ['id', 'name', 'city', 'state'], {
+	'city': (City, Venue.city_id == City.id),
+})
+
+artists = Resource(Artist, [Artist.id], {
+	'id': (Artist.id, None),
+	'name': (Artist.name, None),
+	'city': (City.name, 'city'),
+	'state': (City.state, 'city'),
+	'phone': (Artist.phone, None),
+	'website': (Artist.website, None),
+	'facebook_link': (Artist.facebook_link, None),
+	'image_link': (Artist.image_link, None),
+	'seeking_venue': (Artist.seeking_venue, None),
+	'seeking_description': (Artist.seeking_description, None),
+	'genres': (genre_names(Artist, Artist_genre, Artist_genre.c.artist_id), None),
+	'updated_at': (Artist.updated_at, None),
+}, ['id', 'name', 'city', 'state'], {
+	'city': (City, Artist.city_id == City.id),
+})
+
+shows = Resource(Show, [Show.start_time, Show.id], {
+	'id': (Show.id, None),
+	'start_time': (Show.start_time, None),
+	'venue_id': (Show.venue_id, None),
+	'venue_name': (Venue.name, 'venue'),
+	'venue_image_link': (Venue.image_link, 'venue'),
+	'artist_id': (Show.artist_id, None),
+	'artist_name': (Artist.name, 'artist'),
+	'artist_image_link': (Artist.image_link, 'artist'),
+	'updated_at': (Show.updated_at, None),
+}, ['id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name'], {
+	'venue': (Venue, Show.venue_id == Venue.id),
+	'artist': (Artist, Show.artist_id == Artist.id),
+})
+
+#----------------------------------------------------------------------------#
+# Input.
+#----------------------------------------------------------------------------#
+
+# Feed a JSON object through the same WTForms rules as the HTML forms.
+def form_from_json(form_class):
+	payload = request.get_json(silent=True)
+	if not isinstance(payload, dict):
+		abort(400, 'Expected a JSON object.')
+	return form_from_dict(form_class, payload)
+
+def create(form_class, create_entity, endpoint, id_arg):
+	form = form_from_json(form_class)
+	if not form.validate():
+		return None, json_response({'errors': form.errors}, 400)
+	try:
+		entity_id = create_entity(form.data).id
+		db.session.commit()
+	except (ValueError, DataError):
+		db.session.rollback()
+		abort(400)
+	except IntegrityError as e:
+		db.session.rollback()
+		print(sys.exc_info())
+		if is_booking_conflict(e):
+			abort(409, 'The venue or the artist already has a show at that time.')
+		abort(409)
+	return entity_id, json_response({'id': entity_id}, 201, {'Location': url_for(endpoint, **{id_arg: entity_id})})
+
+def delete(model, show_key, entity_id):
+	deleted = db_delete(model, show_key, entity_id)
+	if deleted is None:
+		db.session.rollback()
+		abort(404)
+	db.session.commit()
+	name, page_keys = deleted
+	page_cache.invalidate(*page_keys)
+	return Response(status=204)
+
+# Create every show of a batch, each item validated like POST /shows and
+# expanded by its recurrence rule, in one INSERT. Invalid items or unknown
+# venue or artist ids reject the whole batch with errors by item index.
+# Occurrences that are double-booked are skipped and listed as conflicts; the
+# response is a 409 only if that leaves nothing to create.
+def create_shows(items):
+	if not isinstance(items, list) or not items:
+		abort(400, 'Expected a non-empty list of shows.')
+	errors = {}
+	series = []
+	for index, item in enumerate(items):
+		form = form_from_dict(ShowForm, item) if isinstance(item, dict) else None
+		if form is None or not form.validate():
+			errors[str(index)] = form.errors if form is not None else ['Expected a JSON object.']
+		else:
+			series.append((index, show_series(form.data)))
+	if errors:
+		return json_response({'errors': errors}, 400)
+	indexes = [index for index, rows_of_item in series for row in rows_of_item]
+	rows = [row for index, rows_of_item in series for row in rows_of_item]
+	if len(rows) > current_app.config['SHOW_BATCH_LIMIT']:
+		abort(400, 'A batch can create at most %d shows.' % current_app.config['SHOW_BATCH_LIMIT'])
+
+	venue_ids, artist_ids = db_existing_ids(rows)
+	for index, rows_of_item in series:
+		if rows_of_item[0]['venue_id'] not in venue_ids:
+			errors.setdefault(str(index), {})['venue_id'] = ['No venue with this id.']
+		if rows_of_item[0]['artist_id'] not in artist_ids:
+			errors.setdefault(str(index), {})['artist_id'] = ['No artist with this id.']
+	if errors:
+		return json_response({'errors': errors}, 400)
+	try:
+		inserted, skipped = db_insert_shows(rows)
+		db.session.commit()
+	except DataError:
+		db.session.rollback()
+		abort(400)
+	page_cache.invalidate(*show_page_keys(inserted))
+
+	return json_response({
+		'created': [show._asdict() for show in inserted],
+		'conflicts': [
+			{'index': indexes[position], 'venue_id': rows[position]['venue_id'], 'artist_id': rows[position]['artist_id'], 'start_time': rows[position]['start_time']}
+			for position in skipped
+		],
+	}, 201 if inserted else 409)
+
+# Free slots of at least ?duration= minutes (default 60) between ?from= and
+# ?to= (ISO 8601, default the next seven days) for one venue or artist.
+def availability(model, key, entity_id):
+	try:
+		start = datetime.fromisoformat(request.args['from']) if 'from' in request.args else datetime.now().replace(second=0, microsecond=0)
+		end = datetime.fromisoformat(request.args['to']) if 'to' in request.args else start + timedelta(days=7)
+		length = timedelta(minutes=int(request.args.get('duration', 60)))
+	except ValueError:
+		abort(400, 'from and to must be ISO 8601 date-times and duration a number of minutes.')
+	if not start < end or end - start > timedelta(days=366) or length <= timedelta(0):
+		abort(400, 'Expected from < to, at most a year apart, and a positive duration.')
+	if db.session.query(model.id).filter(model.id == entity_id).first() is None:
+		abort(404)
+	return json_response({
+		'from': start,
+		'to': end,
+		'slots': [{'start': slot.free_from, 'end': slot.free_to} for slot in db_free_slots(key, entity_id, start, end, length)],
+	})
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+@api.route('/venues')
+@read_only
+def list_venues():
+	names = venues.field_names()
+	return venues.page(venues.query(names), names)
+
+@api.route('/venues/search')
+@read_only
+def search_venues():
+	return json_response(db_search(Venue, Venue_genre, Venue_genre.c.venue_id, request.args.get('q', '')))
+
+@api.route('/venues/<int:venue_id>')
+@read_only
+def get_venue(venue_id):
+	return venues.detail(venue_id)
+
+@api.route('/venues/<int:venue_id>/shows')
+@read_only
+def list_venue_shows(venue_id):
+	names = shows.field_names()
+	return shows.page(shows.query(names).filter(Show.venue_id == venue_id), names)
+
+@api.route('/venues/<int:venue_id>/availability')
+@read_only
+def venue_availability(venue_id):
+	return availability(Venue, Show.venue_id, venue_id)
+
+@api.route('/venues', methods=['POST'])
+def create_venue():
+	entity_id, response = create(VenueForm, db_create_venue, 'api.get_venue', 'venue_id')
+	return response
+
+@api.route('/venues/<int:venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+	return delete(Venue, Show.venue_id, venue_id)
+
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+@api.route('/artists')
+@read_only
+def list_artists():
+	names = artists.field_names()
+	return artists.page(artists.query(names), names)
+
+@api.route('/artists/search')
+@read_only
+def search_artists():
+	return json_response(db_search(Artist, Artist_genre, Artist_genre.c.artist_id, request.args.get('q', '')))
+
+@api.route('/artists/<int:artist_id>')
+@read_only
+def get_artist(artist_id):
+	return artists.detail(artist_id)
+
+@api.route('/artists/<int:artist_id>/shows')
+@read_only
+def list_artist_shows(artist_id):
+	names = shows.field_names()
+	return shows.page(shows.query(names).filter(Show.artist_id == artist_id), names)
+
+@api.route('/artists/<int:artist_id>/availability')
+@read_only
+def artist_availability(artist_id):
+	return availability(Artist, Show.artist_id, artist_id)
+
+@api.route('/artists', methods=['POST'])
+def create_artist():
+	entity_id, response = create(ArtistForm, db_create_artist, 'api.get_artist', 'artist_id')
+	return response
+
+@api.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+	return delete(Artist, Show.artist_id, artist_id)
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+@api.route('/shows')
+@read_only
+def list_shows():
+	names = shows.field_names()
+	return shows.page(shows.query(names), names)
+
+# Shows whose artist or venue name matches `q`, in start_time order.
+@api.route('/shows/search')
+@read_only
+def search_shows():
+	pattern = like_pattern(request.args.get('q', '').strip())
+	names = shows.field_names()
+	query = shows.query(names).filter(or_(
+		Show.artist_id.in_(select(Artist.id).where(Artist.name.ilike(pattern))),
+		Show.venue_id.in_(select(Venue.id).where(Venue.name.ilike(pattern))),
+	))
+	return shows.page(query, names)
+
+@api.route('/shows/<int:show_id>')
+@read_only
+def get_show(show_id):
+	return shows.detail(show_id)
+
+# A show with a recurrence rule is created as a batch of one.
+@api.route('/shows', methods=['POST'])
+def create_show():
+	payload = request.get_json(silent=True)
+	if isinstance(payload, dict) and payload.get('recurrence'):
+		return create_shows([payload])
+	show_id, response = create(ShowForm, db_create_show, 'api.get_show', 'show_id')
+	if show_id is not None:
+		show = db.session.query(Show.venue_id, Show.artist_id).filter(Show.id == show_id).one()
+		page_cache.invalidate('venue:%d' % show.venue_id, 'artist:%d' % show.artist_id)
+	return response
+
+# {"shows": [{"artist_id": .., "venue_id": .., "start_time": .., "duration": ..,
+# "recurrence": ..}, ...]}
+@api.route('/shows/batch', methods=['POST'])
+def create_show_batch():
+	payload = request.get_json(silent=True)
+	if not isinstance(payload, dict):
+		abort(400, 'Expected a JSON object.')
+	return create_shows(payload.get('shows'))
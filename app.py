@@ -3,19 +3,40 @@
 #----------------------------------------------------------------------------#
 
 import json
-import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, g, jsonify, stream_with_context
+import click
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
 from flask_moment import Moment
 from flask_migrate import Migrate
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
-from datetime import datetime
+from datetime import datetime, timezone
+import os
 import sys
-
-from models import Venue, Artist, City, Genre, Show, db
+import time
+from itertools import groupby
+
+from models import Venue, Artist, Show, Venue_genre, Artist_genre, Venue_show_summary, Artist_show_summary, Deletion_counter, db
+from pagination import paginate
+from refdata import reference_cache, db_add_genre, db_add_city
+from pagecache import page_cache, cached_page
+from conditional import conditional, etag_of
+from routing import read_only
+from queries import db_search, db_set_genres, db_create_venue, db_create_artist, db_create_show, db_delete, is_booking_conflict, \
+	show_series, db_existing_ids, db_insert_shows, show_page_keys
+from api import api
+from internal import internal, prometheus
+from metrics import metrics
+import dbpool
+import instrumentation
+from dates import format_datetime
+from summaries import upcoming_shows, roll_show_summaries
+from export import FORMATS as EXPORT_FORMATS, show_rows, chunked
+from feeds import upcoming_show_rows, calendar_lines, cached_stream
+from importer import KINDS as IMPORT_KINDS, READERS as IMPORT_READERS, import_records, read_checkpoint, write_checkpoint
 
 #----------------------------------------------------------------------------#
 # App Config.
@@ -24,61 +45,229 @@ from models import Venue, Artist, City, Genre, Show, db
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
+dbpool.init_app(app)
 db.init_app(app)
+page_cache.init_app(app)
+instrumentation.init_app(app)
+metrics.init_app(app)
 migrate = Migrate(app, db)
+app.register_blueprint(api)
+app.register_blueprint(internal)
+app.register_blueprint(prometheus)
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime_from_raw(date, format='medium'):
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
-
 app.jinja_env.filters['datetime'] = format_datetime
 
 #----------------------------------------------------------------------------#
 # Utils.
 #----------------------------------------------------------------------------#
 
-def db_add_genre(new_genres):
-	current_genres = Genre.query.filter(Genre.name.in_(new_genres)).all()
-	genres = []
-	for genre_name in new_genres:
-		try:
-			index = [x.name for x in current_genres].index(genre_name)
-		except ValueError:
-			index = None
-		if index is None:
-			new_genre = Genre(name = genre_name)
-			db.session.add(new_genre)
-			genres.append(new_genre)
+# Split rows ordered by start_time into past and upcoming show dicts against
+# a single `now`, so both lists come from one query.
+def split_shows(rows, now):
+	past_shows = []
+	upcoming_shows = []
+	for row in rows:
+		if row.start_time < now:
+			past_shows.append(row._asdict())
 		else:
-			genres.append(current_genres[index])
-	return genres
+			upcoming_shows.append(row._asdict())
+	return past_shows, upcoming_shows
+
+# Yield one area per city from venue rows ordered by city_id, streaming each
+# contiguous run straight into the template.
+def group_areas(venues):
+	for city_id, rows in groupby(venues, key=lambda venue: venue.city_id):
+		city, state = reference_cache.city(city_id)
+		yield {
+			'city': city,
+			'state': state,
+			'venues': list(rows),
+		}
+
+# Seconds until the first upcoming show in `rows` (ordered by start_time)
+# becomes a past one, after which a cached detail page is stale.
+def seconds_until_rollover(rows, now):
+	for row in rows:
+		if row.start_time >= now:
+			return (row.start_time - now).total_seconds()
+	return None
+
+# A venue's name and image also appear on the pages of the artists that
+# played there, and vice versa.
+def invalidate_venue_pages(venue_id):
+	artist_ids = db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+	page_cache.invalidate('venue:%d' % venue_id, *['artist:%d' % artist_id for artist_id, in artist_ids])
+
+def invalidate_artist_pages(artist_id):
+	venue_ids = db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+	page_cache.invalidate('artist:%d' % artist_id, *['venue:%d' % venue_id for venue_id, in venue_ids])
 
-def db_add_city(new_city, new_state):
-	city = City.query.filter(City.name == new_city, City.state == new_state).first()
-	if city is None:
-		city = City(name = new_city, state = new_state)
-		db.session.add(city)
-	return city
+#----------------------------------------------------------------------------#
+# Page versions.
+#----------------------------------------------------------------------------#
+
+# Each read page is versioned by one statement of index-backed aggregates:
+# the newest updated_at of every table it renders (as Last-Modified), the
+# newest id and the table's deletion counter to notice rows coming and
+# going and, where shows are split into upcoming and past, the start time of
+# the latest show that has already begun. Detail pages count their own
+# shows, which the (venue_id|artist_id, start_time) indexes serve.
+
+def version_statement(*columns):
+	return select(*[column.scalar_subquery() for column in columns])
+
+def db_version(*columns):
+	return tuple(db.session.execute(version_statement(*columns)).one())
+
+def utc(local_time):
+	return local_time.astimezone(timezone.utc).replace(tzinfo=None) if local_time is not None else None
+
+def deletions(model):
+	return select(Deletion_counter.c.deletions).where(Deletion_counter.c.table_name == model.__tablename__)
+
+def last_started(*criteria):
+	return select(func.max(Show.start_time)).where(Show.start_time < datetime.now(), *criteria)
+
+def venues_version():
+	version = db_version(
+		select(func.max(Venue.updated_at)),
+		select(func.max(Venue.id)),
+		deletions(Venue),
+		select(func.max(Show.updated_at)),
+		select(func.max(Show.id)),
+		deletions(Show),
+		last_started(),
+	)
+	return version[:-1] + (utc(version[-1]),)
+
+def artists_version():
+	version = db_version(
+		select(func.max(Artist.updated_at)),
+		select(func.max(Artist.id)),
+		deletions(Artist),
+		select(func.max(Show.updated_at)),
+		select(func.max(Show.id)),
+		deletions(Show),
+		last_started(),
+	)
+	return version[:-1] + (utc(version[-1]),)
+
+def shows_version():
+	return db_version(
+		select(func.max(Show.updated_at)),
+		select(func.max(Show.id)),
+		deletions(Show),
+		select(func.max(Venue.updated_at)),
+		select(func.max(Artist.updated_at)),
+	)
+
+# The detail page versions are split into the statement and the finishing
+# step so that the async mode (asgi.py) can run the same statement.
+def venue_version_statement(venue_id):
+	return version_statement(
+		select(Venue.updated_at).where(Venue.id == venue_id),
+		select(func.max(Show.updated_at)).where(Show.venue_id == venue_id),
+		select(func.count(Show.id)).where(Show.venue_id == venue_id),
+		select(func.max(Artist.updated_at)).join(Show, Show.artist_id == Artist.id).where(Show.venue_id == venue_id),
+		last_started(Show.venue_id == venue_id),
+	)
+
+def artist_version_statement(artist_id):
+	return version_statement(
+		select(Artist.updated_at).where(Artist.id == artist_id),
+		select(func.max(Show.updated_at)).where(Show.artist_id == artist_id),
+		select(func.count(Show.id)).where(Show.artist_id == artist_id),
+		select(func.max(Venue.updated_at)).join(Show, Show.venue_id == Venue.id).where(Show.artist_id == artist_id),
+		last_started(Show.artist_id == artist_id),
+	)
+
+def detail_version(version):
+	if version[0] is None:
+		return None
+	return version[:-1] + (utc(version[-1]),)
+
+def venue_version(venue_id):
+	return detail_version(tuple(db.session.execute(venue_version_statement(venue_id)).one()))
+
+def artist_version(artist_id):
+	return detail_version(tuple(db.session.execute(artist_version_statement(artist_id)).one()))
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+# Shared by the views below and the async mode, which runs the statements
+# concurrently on separate connections.
+
+def venue_shows_statement(venue_id):
+	return select(
+		Show.artist_id,
+		Artist.name.label('artist_name'),
+		Artist.image_link.label('artist_image_link'),
+		Show.start_time,
+	).join(Artist, Show.artist_id == Artist.id).where(Show.venue_id == venue_id).order_by(Show.start_time, Show.id)
+
+def artist_shows_statement(artist_id):
+	return select(
+		Show.venue_id,
+		Venue.name.label('venue_name'),
+		Venue.image_link.label('venue_image_link'),
+		Show.start_time,
+	).join(Venue, Show.venue_id == Venue.id).where(Show.artist_id == artist_id).order_by(Show.start_time, Show.id)
+
+def venue_page(venue, city, state, genres, shows, now):
+	past_shows, upcoming_shows = split_shows(shows, now)
+	return {
+		'name': venue.name,
+		'id': venue.id,
+		'address': venue.address,
+		'city': city,
+		'state': state,
+		'genres': genres,
+		'phone': venue.phone,
+		'website': venue.website,
+		'facebook_link': venue.facebook_link,
+		'image_link': venue.image_link,
+		'seeking_talent': venue.seeking_talent,
+		'seeking_description': venue.seeking_description,
+		'past_shows_count': len(past_shows),
+		'past_shows': past_shows,
+		'upcoming_shows_count': len(upcoming_shows),
+		'upcoming_shows': upcoming_shows,
+	}
+
+def artist_page(artist, city, state, genres, shows, now):
+	past_shows, upcoming_shows = split_shows(shows, now)
+	return {
+		'name': artist.name,
+		'id': artist.id,
+		'city': city,
+		'state': state,
+		'genres': genres,
+		'phone': artist.phone,
+		'website': artist.website,
+		'facebook_link': artist.facebook_link,
+		'image_link': artist.image_link,
+		'seeking_venue': artist.seeking_venue,
+		'seeking_description': artist.seeking_description,
+		'past_shows_count': len(past_shows),
+		'past_shows': past_shows,
+		'upcoming_shows_count': len(upcoming_shows),
+		'upcoming_shows': upcoming_shows,
+	}
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
+@app.before_first_request
+def warm_reference_cache():
+	reference_cache.warm()
+
 @app.route('/')
 def index():
 	return render_template('pages/home.html')
@@ -88,88 +277,39 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@read_only
+@conditional(venues_version)
 def venues():
-	venues = Venue.query.all()
-	cities = City.query.all()
-	data = []
-	for city in cities:
-		city_venues = []
-		for venue in venues:
-			if city.id == venue.city_id:
-				city_venues.append(venue)
-		if 0!=len(city_venues):
-			data.append({
-				'city': city.name,
-				'state': city.state,
-				'venues': city_venues
-			})
-	return render_template('pages/venues.html', areas=data);
+	venues = paginate(db.session.query(
+		Venue.id,
+		Venue.name,
+		Venue.city_id,
+		upcoming_shows(Venue_show_summary, Venue.id, Show.venue_id, datetime.now()).label('num_upcoming_shows'),
+	).outerjoin(Venue_show_summary, Venue_show_summary.c.venue_id == Venue.id), [Venue.city_id, Venue.id])
+
+	return render_template('pages/venues.html', areas=group_areas(venues), page=venues);
 
 @app.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
-	data = []
 	search_term = request.form.get('search_term', '')
-	venues = Venue.query.all()
-	for venue in venues:
-		if search_term.lower() in venue.name.lower():
-			data.append({
-				'id': venue.id,
-				'name': venue.name
-			})
-	response = {
-		'count': len(data),
-		'data': data
-	}
+	response = db_search(Venue, Venue_genre, Venue_genre.c.venue_id, search_term)
 	return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 @app.route('/venues/<int:venue_id>')
+@read_only
+@conditional(venue_version)
+@cached_page('venue:%(venue_id)d')
 def show_venue(venue_id):
-	venue = Venue.query.get(venue_id)
-	city = City.query.get(venue.city_id)
-	shows = venue.shows
-
-	past_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time<datetime.today()).all()
-	past_shows = []
-	for show in past_shows_query:
-		venue = Venue.query.get(show.venue_id)
-		new_show = {
-			'venue_id': show.venue_id,
-			'venue_name': venue.name,
-			'venue_image_link': venue.image_link,
-			'start_time': format_datetime_from_raw(show.start_time),
-		}
-		past_shows.append(new_show)
-
-	upcoming_shows_query = db.session.query(Show).join(Artist).filter(Show.venue_id==venue_id).filter(Show.start_time>=datetime.today()).all()
-	upcoming_shows = []
-	for show in upcoming_shows_query:
-		venue = Venue.query.get(show.venue_id)
-		new_show = {
-			'venue_id': show.venue_id,
-			'venue_name': venue.name,
-			'venue_image_link': venue.image_link,
-			'start_time': format_datetime_from_raw(show.start_time),
-		}
-		upcoming_shows.append(new_show)
-
-	data = {
-		'name': venue.name,
-		'id': venue.id,
-		'address': venue.address,
-		'city': city.name,
-		'state': city.state,
-		'genres': [x.name for x in venue.genres],
-		'phone': venue.phone,
-		'website': venue.website,
-		'facebook_link': venue.facebook_link,
-		'image_link': venue.image_link,
-		'seeking_talent': venue.seeking_talent,
-		'seeking_description': venue.seeking_description,
-		'past_shows_count': len(past_shows),
-		'past_shows': past_shows,
-		'upcoming_shows_count': len(upcoming_shows),
-		'upcoming_shows': upcoming_shows,
-	}
+	venue = Venue.query.options(joinedload(Venue.genres)).get(venue_id)
+	if venue is None:
+		abort(404)
+	city, state = reference_cache.city(venue.city_id)
+
+	shows = db.session.execute(venue_shows_statement(venue_id)).all()
+	now = datetime.now()
+	g.page_expires_in = seconds_until_rollover(shows, now)
+	data = venue_page(venue, city, state, [x.name for x in venue.genres], shows, now)
 	return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -189,26 +329,7 @@ def create_venue_submission():
 			break
 		return render_template('forms/new_venue.html', form=form)
 	try:
-		genres = db_add_genre(request.form.getlist('genres'))
-		city = db_add_city(request.form['city'], request.form['state'])
-		db.session.flush()
-
-		venue = Venue(
-			name = request.form['name'],
-			address = request.form['address'],
-			phone = request.form['phone'],
-			city_id = city.id,
-			image_link = request.form['image_link'],
-			facebook_link = request.form['facebook_link'],
-			website = request.form['website_link'],
-			seeking_talent = request.form.get('seeking_talent', '') == 'y',
-			seeking_description = request.form['seeking_description'],
-		)
-
-		for genre in genres:
-			venue.genres.append(genre)
-
-		db.session.add(venue)
+		db_create_venue(form.data)
 		db.session.commit()
 		flash('Venue ' + request.form['name'] + ' was successfully listed!')
 	except:
@@ -220,85 +341,68 @@ def create_venue_submission():
 
 	return render_template('pages/home.html')
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+# Called from the Delete button on the detail pages, which goes to the home
+# page on success, where the flashed message is shown.
+def delete_entity(model, show_key, entity_id, label):
+	try:
+		deleted = db_delete(model, show_key, entity_id)
+		if deleted is not None:
+			db.session.commit()
+	except:
+		db.session.rollback()
+		print(sys.exc_info())
+		return jsonify({'success': False}), 500
+	finally:
+		db.session.close()
+	if deleted is None:
+		abort(404)
+	name, page_keys = deleted
+	page_cache.invalidate(*page_keys)
+	flash(label + ' ' + name + ' was successfully deleted!')
+	return jsonify({'success': True})
+
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
-  # TODO: Complete this endpoint for taking a venue_id, and using
-  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+	return delete_entity(Venue, Show.venue_id, venue_id, 'Venue')
 
-  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-  # clicking that button delete it from the db then redirect the user to the homepage
-  return None
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+	return delete_entity(Artist, Show.artist_id, artist_id, 'Artist')
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@read_only
+@conditional(artists_version)
 def artists():
-	data = Artist.query.all()
-	return render_template('pages/artists.html', artists=data)
+	data = paginate(db.session.query(
+		Artist.id,
+		Artist.name,
+		upcoming_shows(Artist_show_summary, Artist.id, Show.artist_id, datetime.now()).label('num_upcoming_shows'),
+	).outerjoin(Artist_show_summary, Artist_show_summary.c.artist_id == Artist.id), [Artist.id])
+	return render_template('pages/artists.html', artists=data, page=data)
 
 @app.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
 	search_term = request.form.get('search_term', '')
-	artists = Artist.query.all()
-
-	data = [{
-		'id': artist.id,
-		'name': artist.name
-	} for artist in artists if search_term.lower() in artist.name.lower()]
-
-	response = {
-		'count': len(data),
-		'data': data
-	}
-	return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+	response = db_search(Artist, Artist_genre, Artist_genre.c.artist_id, search_term)
+	return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@read_only
+@conditional(artist_version)
+@cached_page('artist:%(artist_id)d')
 def show_artist(artist_id):
-	artist = Artist.query.get(artist_id)
-	city = City.query.get(artist.city_id)
-	shows = artist.shows
+	artist = Artist.query.options(joinedload(Artist.genres)).get(artist_id)
+	if artist is None:
+		abort(404)
+	city, state = reference_cache.city(artist.city_id)
 
-	past_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time<datetime.today()).all()
-	past_shows = []
-	for show in past_shows_query:
-		venue = Venue.query.get(show.venue_id)
-		new_show = {
-			'venue_id': show.venue_id,
-			'venue_name': venue.name,
-			'venue_image_link': venue.image_link,
-			'start_time': format_datetime_from_raw(show.start_time),
-		}
-		past_shows.append(new_show)
-
-	upcoming_shows_query = db.session.query(Show).join(Venue).filter(Show.artist_id==artist_id).filter(Show.start_time>=datetime.today()).all()
-	upcoming_shows = []
-	for show in upcoming_shows_query:
-		venue = Venue.query.get(show.venue_id)
-		new_show = {
-			'venue_id': show.venue_id,
-			'venue_name': venue.name,
-			'venue_image_link': venue.image_link,
-			'start_time': format_datetime_from_raw(show.start_time),
-		}
-		upcoming_shows.append(new_show)
-
-	data = {
-		'name': artist.name,
-		'id': artist.id,
-		'city': city.name,
-		'state': city.state,
-		'genres': [x.name for x in artist.genres],
-		'phone': artist.phone,
-		'website': artist.website,
-		'facebook_link': artist.facebook_link,
-		'image_link': artist.image_link,
-		'seeking_venue': artist.seeking_venue,
-		'seeking_description': artist.seeking_description,
-		'past_shows_count': len(past_shows),
-		'past_shows': past_shows,
-		'upcoming_shows_count': len(upcoming_shows),
-		'upcoming_shows': upcoming_shows,
-	}
+	shows = db.session.execute(artist_shows_statement(artist_id)).all()
+	now = datetime.now()
+	g.page_expires_in = seconds_until_rollover(shows, now)
+	data = artist_page(artist, city, state, [x.name for x in artist.genres], shows, now)
 
 	return render_template('pages/show_artist.html', artist=data)
 
@@ -307,14 +411,16 @@ def show_artist(artist_id):
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
 	form = ArtistForm()
-	artist = Artist.query.get(artist_id)
-	city = City.query.get(artist.city_id)
+	artist = Artist.query.options(joinedload(Artist.genres)).get(artist_id)
+	if artist is None:
+		abort(404)
+	city, state = reference_cache.city(artist.city_id)
 	artist = {
 		'id': artist.id,
 		'name': artist.name,
 		'genres': [x.name for x in artist.genres],
-		'city': city.name,
-		'state': city.state,
+		'city': city,
+		'state': state,
 		'phone': artist.phone,
 		'website': artist.website,
 		'facebook_link': artist.facebook_link,
@@ -343,25 +449,23 @@ def edit_artist_submission(artist_id):
 			break
 		return redirect(url_for('edit_artist', artist_id=artist_id))
 	try:
-		genres = db_add_genre(request.form.getlist('genres'))
-		city = db_add_city(request.form['city'], request.form['state'])
-		db.session.flush()
+		genre_ids = db_add_genre(request.form.getlist('genres'))
+		city_id = db_add_city(request.form['city'], request.form['state'])
 
 		artist = Artist.query.get(artist_id)
 		artist.name = request.form['name']
-		artist.city_id = city.id
+		artist.city_id = city_id
 		artist.phone = request.form['phone']
 		artist.website = request.form['website_link']
 		artist.facebook_link = request.form['facebook_link']
 		artist.seeking_venue = request.form.get('seeking_venue', '') == 'y'
 		artist.seeking_description = request.form['seeking_description']
 		artist.image_link = request.form['image_link']
+		artist.updated_at = datetime.utcnow()
 
-		artist.genres = []
-		for genre in genres:
-			artist.genres.append(genre)
-
+		db_set_genres(Artist_genre, Artist_genre.c.artist_id, artist_id, genre_ids)
 		db.session.commit()
+		invalidate_artist_pages(artist_id)
 	except:
 		db.session.rollback()
 		print(sys.exc_info())
@@ -372,15 +476,17 @@ def edit_artist_submission(artist_id):
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
 	form = VenueForm()
-	venue = Venue.query.get(venue_id)
-	city = City.query.get(venue.city_id)
+	venue = Venue.query.options(joinedload(Venue.genres)).get(venue_id)
+	if venue is None:
+		abort(404)
+	city, state = reference_cache.city(venue.city_id)
 	venue = {
 		'id': venue.id,
 		'name': venue.name,
 		'genres': [x.name for x in venue.genres],
 		'address': venue.address,
-		'city': city.name,
-		'state': city.state,
+		'city': city,
+		'state': state,
 		'phone': venue.phone,
 		'website': venue.website,
 		'facebook_link': venue.facebook_link,
@@ -410,26 +516,24 @@ def edit_venue_submission(venue_id):
 			break
 		return redirect(url_for('edit_venue', venue_id=venue_id))
 	try:
-		genres = db_add_genre(request.form.getlist('genres'))
-		city = db_add_city(request.form['city'], request.form['state'])
-		db.session.flush()
+		genre_ids = db_add_genre(request.form.getlist('genres'))
+		city_id = db_add_city(request.form['city'], request.form['state'])
 
 		venue = Venue.query.get(venue_id)
 		venue.name = request.form['name']
 		venue.address = request.form['address']
-		venue.city_id = city.id
+		venue.city_id = city_id
 		venue.phone = request.form['phone']
 		venue.website = request.form['website_link']
 		venue.facebook_link = request.form['facebook_link']
 		venue.seeking_talent = request.form.get('seeking_talent', '') == 'y'
 		venue.seeking_description = request.form['seeking_description']
 		venue.image_link = request.form['image_link']
+		venue.updated_at = datetime.utcnow()
 
-		venue.genres = []
-		for genre in genres:
-			venue.genres.append(genre)
-
+		db_set_genres(Venue_genre, Venue_genre.c.venue_id, venue_id, genre_ids)
 		db.session.commit()
+		invalidate_venue_pages(venue_id)
 	except:
 		db.session.rollback()
 		print(sys.exc_info())
@@ -454,25 +558,7 @@ def create_artist_submission():
 			break
 		return render_template('forms/new_artist.html', form=form)
 	try:
-		genres = db_add_genre(request.form.getlist('genres'))
-		city = db_add_city(request.form['city'], request.form['state'])
-		db.session.flush()
-
-		artist = Artist(
-			name = request.form['name'],
-			phone = request.form['phone'],
-			city_id = city.id,
-			image_link = request.form['image_link'],
-			facebook_link = request.form['facebook_link'],
-			website = request.form['website_link'],
-			seeking_venue = request.form.get('seeking_venue', '') == 'y',
-			seeking_description = request.form['seeking_description'],
-		)
-
-		for genre in genres:
-			artist.genres.append(genre)
-
-		db.session.add(artist)
+		db_create_artist(form.data)
 		db.session.commit()
 		flash('Artist ' + request.form['name'] + ' was successfully listed!')
 	except:
@@ -489,21 +575,76 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@read_only
+@conditional(shows_version)
 def shows():
-	shows = Show.query.all()
-	data=[]
-	for show in shows:
-		venue = Venue.query.get(show.venue_id)
-		artist = Artist.query.get(show.artist_id)
-		data.append({
-			'venue_id': show.venue_id,
-			'venue_name': venue.name if None!=venue else '',
-			'artist_id': show.artist_id,
-			'artist_name': artist.name if None!=artist else '',
-			'artist_image_link': artist.image_link if None!=artist else '',
-			'start_time': format_datetime_from_raw(show.start_time)
-		})
-	return render_template('pages/shows.html', shows=data)
+	shows = paginate(db.session.query(
+		Show.id,
+		Show.venue_id,
+		Venue.name.label('venue_name'),
+		Show.artist_id,
+		Artist.name.label('artist_name'),
+		Artist.image_link.label('artist_image_link'),
+		Show.start_time,
+	).join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id), [Show.start_time, Show.id])
+
+	data = [{
+		'venue_id': show.venue_id,
+		'venue_name': show.venue_name,
+		'artist_id': show.artist_id,
+		'artist_name': show.artist_name,
+		'artist_image_link': show.artist_image_link,
+		'start_time': show.start_time
+	} for show in shows]
+	return render_template('pages/shows.html', shows=data, page=shows)
+
+@app.route('/shows/export.<any(ndjson, csv):format>')
+@read_only
+def export_shows(format):
+	lines, mimetype = EXPORT_FORMATS[format]
+	return Response(
+		stream_with_context(chunked(lines(show_rows()))),
+		mimetype=mimetype,
+		headers={'Content-Disposition': 'attachment; filename=shows.' + format},
+	)
+
+#----------------------------------------------------------------------------#
+# Calendar feeds.
+#----------------------------------------------------------------------------#
+
+# A venue's or artist's upcoming shows as iCalendar, streamed from the
+# (venue_id, start_time) or (artist_id, start_time) index. The whole body is
+# cached under the page version, which changes when any of the entity's
+# shows, the entity or the other side of its shows changes, or a show starts,
+# so a feed is only rebuilt after such a change and nothing has to invalidate
+# it; pollers sending If-None-Match get a 304 from the version alone.
+def calendar_feed(model, show_key, entity_id, version, link):
+	values = g.get('page_version') or version(entity_id)
+	if values is None:
+		abort(404)
+	key = 'calendar:%s:%d:%s' % (model.__tablename__.lower(), entity_id, etag_of('', values))
+	body = page_cache.get(key)
+	if body is None:
+		name = db.session.query(model.name).filter(model.id == entity_id).scalar()
+		lines = calendar_lines(name, upcoming_show_rows(show_key, entity_id, datetime.now()), request.host_url, request.host.split(':')[0], link)
+		body = stream_with_context(cached_stream(key, chunked(lines), app.config['CALENDAR_CACHE_TTL']))
+	return Response(
+		body,
+		mimetype='text/calendar',
+		headers={'Content-Disposition': 'inline; filename=calendar.ics'},
+	)
+
+@app.route('/venues/<int:venue_id>/calendar.ics')
+@read_only
+@conditional(venue_version)
+def venue_calendar(venue_id):
+	return calendar_feed(Venue, Show.venue_id, venue_id, venue_version, lambda show: 'artists/%d' % show.artist_id)
+
+@app.route('/artists/<int:artist_id>/calendar.ics')
+@read_only
+@conditional(artist_version)
+def artist_calendar(artist_id):
+	return calendar_feed(Artist, Show.artist_id, artist_id, artist_version, lambda show: 'venues/%d' % show.venue_id)
 
 @app.route('/shows/create')
 def create_shows():
@@ -512,24 +653,113 @@ def create_shows():
 
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
+	form = ShowForm(request.form)
+	if not form.validate():
+		for n,e in form.errors.items():
+			flash(e[0])
+			break
+		return render_template('forms/new_show.html', form=form)
+	if form.recurrence.data:
+		return create_show_series(form)
 	try:
-		show = Show(
-			artist_id = request.form['artist_id'],
-			venue_id = request.form['venue_id'],
-			start_time = request.form['start_time'],
-		)
-		db.session.add(show)
+		show = db_create_show(form.data)
+		page_keys = ('venue:%d' % show.venue_id, 'artist:%d' % show.artist_id)
 		db.session.commit()
+		page_cache.invalidate(*page_keys)
 		flash('Show was successfully listed!')
+	except Exception as e:
+		db.session.rollback()
+		print(sys.exc_info())
+		if is_booking_conflict(e):
+			flash('The venue or the artist already has a show at that time. Show could not be listed.')
+		else:
+			flash('An error occurred. Show could not be listed.')
+	finally:
+		db.session.close()
+
+	return render_template('pages/home.html')
+
+# Every occurrence of the form's recurrence rule in one INSERT. Dates that
+# are already booked are skipped and listed in the flashed message.
+def create_show_series(form):
+	try:
+		rows = show_series(form.data)
+		venue_ids, artist_ids = db_existing_ids(rows)
+		if not venue_ids or not artist_ids:
+			flash('There is no venue or no artist with that id. Shows could not be listed.')
+			return render_template('forms/new_show.html', form=form)
+		if len(rows) > app.config['SHOW_BATCH_LIMIT']:
+			flash('At most %d shows can be listed at once.' % app.config['SHOW_BATCH_LIMIT'])
+			return render_template('forms/new_show.html', form=form)
+		inserted, skipped = db_insert_shows(rows)
+		db.session.commit()
+		page_cache.invalidate(*show_page_keys(inserted))
+		flash('%d %s successfully listed!' % (len(inserted), 'show was' if len(inserted) == 1 else 'shows were'))
+		if skipped:
+			flash('The venue or the artist already has a show on ' + ', '.join(
+				format_datetime(rows[position]['start_time'], 'medium') for position in skipped) + '. Those were not listed.')
 	except:
 		db.session.rollback()
 		print(sys.exc_info())
-		flash('An error occurred. Show could not be listed.')
+		flash('An error occurred. Shows could not be listed.')
 	finally:
 		db.session.close()
 
 	return render_template('pages/home.html')
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('export-shows')
+@click.option('--format', 'format', type=click.Choice(sorted(EXPORT_FORMATS)), default='ndjson')
+@click.option('--output', type=click.File('w'), default='-')
+def export_shows_command(format, output):
+	'''Stream every show with its artist and venue names.'''
+	lines, mimetype = EXPORT_FORMATS[format]
+	for line in lines(show_rows()):
+		output.write(line)
+
+# Run every few minutes (cron, a systemd timer) to move shows that have
+# started from the upcoming to the past counters.
+@app.cli.command('roll-show-summaries')
+def roll_show_summaries_command():
+	'''Recount show summaries whose next show has started.'''
+	rolled = roll_show_summaries()
+	db.session.commit()
+	click.echo('Rolled %d summaries forward.' % rolled)
+
+# Records that fail validation go to <path>.rejects.ndjson. Progress is saved
+# to <path>.checkpoint.json after every chunk; rerunning the same command
+# resumes after the last committed chunk unless --restart is given.
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(sorted(IMPORT_READERS)), default=None, help='Defaults to the file extension.')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=1000)
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None)
+@click.option('--restart', is_flag=True, help='Ignore any saved checkpoint.')
+def import_command(kind, path, format, chunk_size, checkpoint, restart):
+	'''Bulk load venues, artists or shows from a CSV or NDJSON file.'''
+	format = format or os.path.splitext(path)[1].lstrip('.').lower()
+	if format not in IMPORT_READERS:
+		raise click.UsageError('Cannot tell the format of %s; pass --format.' % path)
+	checkpoint = checkpoint or path + '.checkpoint.json'
+	skip = 0 if restart else read_checkpoint(checkpoint)
+	if skip:
+		click.echo('Resuming after %d records.' % skip)
+	started = time.monotonic()
+	imported = rejected = 0
+	with open(path + '.rejects.ndjson', 'a' if skip else 'w') as rejects:
+		for report in import_records(kind, IMPORT_READERS[format](path), rejects, chunk_size, skip):
+			write_checkpoint(checkpoint, report['done'])
+			imported += report['imported']
+			rejected += report['rejected']
+			click.echo('%(done)10d  +%(imported)d imported  %(rejected)d rejected  %(seconds).2fs  %(rate).0f rows/s' % dict(report,
+				rate=report['records'] / report['seconds'] if report['seconds'] else 0))
+	elapsed = time.monotonic() - started
+	click.echo('Imported %d, rejected %d in %.1fs (%.0f rows/s).' % (imported, rejected, elapsed, (imported + rejected) / elapsed if elapsed else 0))
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -0,0 +1,218 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+try:
+	from sqlalchemy.ext.asyncio import create_async_engine
+	from starlette.applications import Starlette
+	from starlette.concurrency import run_in_threadpool
+	from starlette.middleware.wsgi import WSGIMiddleware
+	from starlette.requests import Request
+	from starlette.responses import HTMLResponse, Response
+	from starlette.routing import Mount, Route
+except ImportError as e:
+	raise ImportError('The async mode needs the packages in requirements-async.txt (%s)' % e)
+
+from flask import render_template
+from itsdangerous import BadSignature
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import http_date, parse_date, parse_etags
+
+from app import app, detail_version, seconds_until_rollover, venue_page, artist_page, \
+	venue_version_statement, artist_version_statement, venue_shows_statement, artist_shows_statement
+from api import dumps, venues as venue_resource, artists as artist_resource, shows as show_resource
+from conditional import etag_of, is_not_modified, last_modified_of
+from dbpool import async_engine_options
+from metrics import metrics
+from models import Venue, Artist, City, Genre, Venue_genre, Artist_genre
+from pagecache import page_cache
+from routing import REPLICA
+
+#----------------------------------------------------------------------------#
+# Async serving mode.
+#----------------------------------------------------------------------------#
+
+# An ASGI application for uvicorn (or any ASGI server):
+#
+#   uvicorn asgi:application --workers 4
+#
+# The venue and artist pages and the API's detail endpoints are served here
+# on asyncpg engines, so a worker waiting on Postgres keeps taking requests,
+# and a page's independent queries run concurrently on separate connections.
+# Everything else, and any request these handlers decline (writes, pending
+# flash messages, 404s, bad ?fields=), goes to the unchanged Flask app, which
+# runs in a thread pool. The WSGI entry point (app.py) is not affected.
+
+def async_url(url):
+	return make_url(url).set(drivername='postgresql+asyncpg')
+
+primary = create_async_engine(async_url(app.config['SQLALCHEMY_DATABASE_URI']), **async_engine_options(app.config))
+replica = None
+if REPLICA in app.config['SQLALCHEMY_BINDS']:
+	replica = create_async_engine(async_url(app.config['SQLALCHEMY_BINDS'][REPLICA]), **async_engine_options(app.config))
+
+wsgi = WSGIMiddleware(app)
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+# The Flask session, read from the same signed cookie, for flash messages and
+# the read-your-writes window (see routing.py).
+def flask_session(request):
+	serializer = app.session_interface.get_signing_serializer(app)
+	cookie = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+	if serializer is None or not cookie:
+		return {}
+	try:
+		return serializer.loads(cookie, max_age=int(app.permanent_session_lifetime.total_seconds()))
+	except BadSignature:
+		return {}
+
+def read_engine(session):
+	if replica is not None and session.get('primary_until', 0) <= time.time():
+		return replica
+	return primary
+
+async def first_row(engine, statement):
+	async with engine.connect() as conn:
+		return (await conn.execute(statement)).first()
+
+async def all_rows(engine, statement):
+	async with engine.connect() as conn:
+		return (await conn.execute(statement)).all()
+
+# Same as werkzeug's request.full_path, which the ETags are computed from.
+def full_path(request):
+	return request.url.path + '?' + request.url.query
+
+# Templates use url_for, request.endpoint and flashed messages, so they are
+# rendered in a Flask request context, off the event loop.
+def render(template, request, context):
+	with app.test_request_context(request.url.path, headers={'Cookie': request.headers.get('cookie', '')}):
+		return render_template(template, **context)
+
+# A route served by `handler(request, target, entity_id)`, which returns a
+# response, or None to hand the request to the Flask app.
+class AsyncView(object):
+	def __init__(self, endpoint, handler, target):
+		self.endpoint = endpoint
+		self.handler = handler
+		self.target = target
+
+	async def __call__(self, scope, receive, send):
+		started = time.perf_counter()
+		request = Request(scope, receive)
+		response = None
+		if request.method == 'GET':
+			response = await self.handler(request, self.target, request.path_params['entity_id'])
+		if response is None:
+			await wsgi(scope, receive, send)
+			return
+		elapsed = time.perf_counter() - started
+		response.headers['Server-Timing'] = 'total;dur=%.1f' % (elapsed * 1000)
+		metrics.observe(self.endpoint, request.method, response.status_code, elapsed)
+		await response(scope, receive, send)
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+class DetailPage(object):
+	def __init__(self, model, genre_table, genre_key, name, template, cache_key, version, shows, build):
+		self.model = model
+		self.genre_table = genre_table
+		self.genre_key = genre_key
+		self.name = name
+		self.template = template
+		self.cache_key = cache_key
+		self.version = version
+		self.shows = shows
+		self.build = build
+
+	def entity(self, entity_id):
+		return select(*self.model.__table__.columns, City.name.label('city'), City.state.label('state')) \
+			.join(City, self.model.city_id == City.id).where(self.model.id == entity_id)
+
+	def genres(self, entity_id):
+		return select(Genre.name).join(self.genre_table, self.genre_table.c.genre_id == Genre.id) \
+			.where(self.genre_key == entity_id)
+
+venue_detail = DetailPage(Venue, Venue_genre, Venue_genre.c.venue_id, 'venue', 'pages/show_venue.html',
+	'venue:%d', venue_version_statement, venue_shows_statement, venue_page)
+artist_detail = DetailPage(Artist, Artist_genre, Artist_genre.c.artist_id, 'artist', 'pages/show_artist.html',
+	'artist:%d', artist_version_statement, artist_shows_statement, artist_page)
+
+# The async counterpart of @conditional and @cached_page over show_venue and
+# show_artist: the version statement first, then a 304, the cached page, or
+# the entity, its genres and its shows fetched at the same time.
+async def show_detail(request, page, entity_id):
+	session = flask_session(request)
+	if '_flashes' in session:
+		return None
+	engine = read_engine(session)
+	values = detail_version(tuple(await first_row(engine, page.version(entity_id))))
+	if values is None:
+		return None
+	etag = etag_of(full_path(request), values)
+	last_modified = last_modified_of(values)
+	if is_not_modified(parse_etags(request.headers.get('if-none-match')), parse_date(request.headers.get('if-modified-since')), etag, last_modified):
+		response = Response(status_code=304)
+	else:
+		key = page.cache_key % entity_id
+		body = await run_in_threadpool(page_cache.get, key)
+		if body is None:
+			entity, genres, shows = await asyncio.gather(
+				first_row(engine, page.entity(entity_id)),
+				all_rows(engine, page.genres(entity_id)),
+				all_rows(engine, page.shows(entity_id)),
+			)
+			if entity is None:
+				return None
+			now = datetime.now()
+			data = page.build(entity, entity.city, entity.state, [genre.name for genre in genres], shows, now)
+			body = await run_in_threadpool(render, page.template, request, {page.name: data})
+			await run_in_threadpool(page_cache.set, key, body, seconds_until_rollover(shows, now))
+		response = HTMLResponse(body)
+	response.headers['ETag'] = '"%s"' % etag
+	if last_modified is not None:
+		response.headers['Last-Modified'] = http_date(last_modified)
+	response.headers['Cache-Control'] = 'no-cache'
+	return response
+
+#----------------------------------------------------------------------------#
+# API.
+#----------------------------------------------------------------------------#
+
+async def api_detail(request, resource, entity_id):
+	try:
+		names = resource.field_names(request.query_params.get('fields', ''))
+	except HTTPException:
+		return None
+	row = await first_row(read_engine(flask_session(request)), resource.detail_statement(names, entity_id))
+	if row is None:
+		return None
+	return Response(dumps(dict((name, getattr(row, name)) for name in names)), media_type='application/json')
+
+#----------------------------------------------------------------------------#
+# Application.
+#----------------------------------------------------------------------------#
+
+@asynccontextmanager
+async def lifespan(application):
+	yield
+	await primary.dispose()
+	if replica is not None:
+		await replica.dispose()
+
+application = Starlette(lifespan=lifespan, routes=[
+	Route('/venues/{entity_id:int}', AsyncView('show_venue', show_detail, venue_detail)),
+	Route('/artists/{entity_id:int}', AsyncView('show_artist', show_detail, artist_detail)),
+	Route('/api/v1/venues/{entity_id:int}', AsyncView('api.get_venue', api_detail, venue_resource)),
+	Route('/api/v1/artists/{entity_id:int}', AsyncView('api.get_artist', api_detail, artist_resource)),
+	Route('/api/v1/shows/{entity_id:int}', AsyncView('api.get_show', api_detail, show_resource)),
+	Mount('/', app=wsgi),
+])
@@ -0,0 +1,64 @@
+#----------------------------------------------------------------------------#
+# Date formatting micro-benchmark.
+#
+# Formats a page worth of show times the old way (babel.dates.format_datetime
+# with a pattern string, then the filter re-parsing the formatted text with
+# dateutil and formatting it again) and through dates.format_datetime, cold
+# and with a warm memo. Needs no database.
+#
+#   python benchmarks/bench_dates.py [--shows 50] [--repeat 200]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import babel.dates
+import dateutil.parser
+from dates import PATTERNS, format_datetime, format_datetime_value
+
+def old_format(value, format):
+	return babel.dates.format_datetime(value, PATTERNS[format], locale='en')
+
+def old_filter(value, format):
+	return old_format(dateutil.parser.parse(value), format)
+
+# One listing page: format the view's 'medium' string, then the template
+# filter turns it back into a datetime and renders 'full'.
+def old_page(times):
+	for value in times:
+		old_filter(old_format(value, 'medium'), 'full')
+
+def new_page(times):
+	for value in times:
+		format_datetime(value, 'full')
+
+def cold_page(times):
+	format_datetime_value.cache_clear()
+	new_page(times)
+
+def timed(page, times, repeat):
+	samples = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		page(times)
+		samples.append((time.perf_counter() - start) * 1000)
+	return statistics.median(samples), max(samples)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--shows', type=int, default=50)
+	parser.add_argument('--repeat', type=int, default=200)
+	args = parser.parse_args()
+
+	start = datetime(2030, 1, 1, 20, 0)
+	times = [start + timedelta(hours=7 * i) for i in range(args.shows)]
+	print('%-28s %10s %10s' % ('path', 'median ms', 'max ms'))
+	for name, page in [('format + re-parse (old)', old_page), ('compiled, cold memo', cold_page), ('compiled, warm memo', new_page)]:
+		median, worst = timed(page, times, args.repeat)
+		print('%-28s %10.3f %10.3f' % (name, median, worst))
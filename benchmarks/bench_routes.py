@@ -0,0 +1,391 @@
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#
+# Times every public route of the app (not /internal/*, /metrics or static
+# files) against whatever the database holds (see seed.py) and writes the
+# figures to benchmarks/results/<commit>-<mode>.json, so that two commits can
+# be compared on the same data.
+#
+#   client  replays each route N times in-process through the Flask test
+#           client: latency without network or server overhead, plus the
+#           SQL statement count from the Server-Timing header.
+#   http    drives a running server (gunicorn, flask run) with --concurrency
+#           threads for --seconds per route: latency under load and
+#           requests per second.
+#   compare prints the change in median and p95 latency per route between
+#           two result files and exits non-zero if any route got slower
+#           than --threshold percent.
+#
+#   python benchmarks/bench_routes.py client [--repeat 50] [--writes]
+#   python benchmarks/bench_routes.py http --url http://localhost:5000 [--concurrency 16] [--seconds 10]
+#   python benchmarks/bench_routes.py compare OLD.json NEW.json [--threshold 10]
+#----------------------------------------------------------------------------#
+
+import argparse
+import itertools
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+# (name, method, path, form data, JSON body), where any of the last three
+# may be a function called afresh for every request. The ids are the first
+# venue, artist and show; the search terms match a few rows of seed.py's
+# data.
+def read_routes(venue_id, artist_id, show_id):
+	tomorrow = (datetime.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0).isoformat()
+	return [
+		('index', 'GET', '/', None, None),
+		('venues', 'GET', '/venues', None, None),
+		('venues.search', 'POST', '/venues/search', {'search_term': 'music'}, None),
+		('venue', 'GET', '/venues/%d' % venue_id, None, None),
+		('venue.edit', 'GET', '/venues/%d/edit' % venue_id, None, None),
+		('venue.create', 'GET', '/venues/create', None, None),
+		('artists', 'GET', '/artists', None, None),
+		('artists.search', 'POST', '/artists/search', {'search_term': 'city 1'}, None),
+		('artist', 'GET', '/artists/%d' % artist_id, None, None),
+		('artist.edit', 'GET', '/artists/%d/edit' % artist_id, None, None),
+		('artist.create', 'GET', '/artists/create', None, None),
+		('shows', 'GET', '/shows', None, None),
+		('show.create', 'GET', '/shows/create', None, None),
+		('shows.export', 'GET', '/shows/export.ndjson', None, None),
+		('shows.export.csv', 'GET', '/shows/export.csv', None, None),
+		('venue.calendar', 'GET', '/venues/%d/calendar.ics' % venue_id, None, None),
+		('artist.calendar', 'GET', '/artists/%d/calendar.ics' % artist_id, None, None),
+		('api.venues', 'GET', '/api/v1/venues', None, None),
+		('api.venues.search', 'GET', '/api/v1/venues/search?q=music', None, None),
+		('api.venue', 'GET', '/api/v1/venues/%d' % venue_id, None, None),
+		('api.venue.shows', 'GET', '/api/v1/venues/%d/shows' % venue_id, None, None),
+		('api.venue.availability', 'GET', '/api/v1/venues/%d/availability' % venue_id, None, None),
+		('api.artists', 'GET', '/api/v1/artists', None, None),
+		('api.artists.search', 'GET', '/api/v1/artists/search?q=city', None, None),
+		('api.artist', 'GET', '/api/v1/artists/%d' % artist_id, None, None),
+		('api.artist.shows', 'GET', '/api/v1/artists/%d/shows' % artist_id, None, None),
+		('api.artist.availability', 'GET', '/api/v1/artists/%d/availability?%s' % (
+			artist_id, urllib.parse.urlencode({'from': tomorrow, 'duration': 120})), None, None),
+		('api.shows', 'GET', '/api/v1/shows', None, None),
+		('api.shows.search', 'GET', '/api/v1/shows/search?q=venue', None, None),
+		('api.show', 'GET', '/api/v1/shows/%d' % show_id, None, None),
+	]
+
+# Writes add, change or delete rows on every call, so they are only run
+# when asked for and never against data that matters. They work on venues
+# and artists of their own, made through the API by `create`: edits on one
+# pair made up front, show creation at that pair in consecutive slots, and
+# each delete on a row made just for it (before the clock starts). The HTML
+# form posts need CSRF off, which only the client mode can arrange.
+counter = itertools.count()
+slots = itertools.count()
+
+def entity(kind):
+	n = next(counter)
+	return {
+		'name': 'Benchmark %s %d-%d' % (kind, os.getpid(), n),
+		'city': 'Benchmark City',
+		'state': 'CA',
+		'address': '%d Benchmark Road' % n,
+		'phone': '555-555-5555',
+		'genres': ['Jazz', 'Blues'],
+		'image_link': '',
+		'facebook_link': '',
+		'website_link': '',
+		'seeking_description': '',
+	}
+
+# A two hour show in the next free three hour slot, so that none overlap.
+def show(venue_id, artist_id, start):
+	return {
+		'venue_id': venue_id,
+		'artist_id': artist_id,
+		'start_time': (start + timedelta(hours=3 * next(slots))).strftime('%Y-%m-%d %H:%M:%S'),
+		'duration': 120,
+	}
+
+# Returns the routes and a check(get) that `get`s the edited venue and
+# artist through the API and exits if the last edit of either did not land:
+# the edit views redirect whether or not they saved, so their statuses
+# alone cannot tell.
+def write_routes(create):
+	venue_id, artist_id = create('venues', entity('Venue')), create('artists', entity('Artist'))
+	start = (datetime.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+	edited = {}
+	def edit(kind, entity_id):
+		def data():
+			edited[(kind, entity_id)] = values = entity(kind)
+			return values
+		return data
+	def check(get):
+		for (kind, entity_id), values in sorted(edited.items()):
+			name = get('/api/v1/%ss/%d?fields=name' % (kind.lower(), entity_id))['name']
+			if name != values['name']:
+				sys.exit('%s %d was not edited; the %s.edit.post figures are of a failed request.' % (kind, entity_id, kind.lower()))
+	return check, [
+		('venue.create.post', 'POST', '/venues/create', lambda: entity('Venue'), None),
+		('venue.edit.post', 'POST', '/venues/%d/edit' % venue_id, edit('Venue', venue_id), None),
+		('venue.delete', 'DELETE', lambda: '/venues/%d' % create('venues', entity('Venue')), None, None),
+		('artist.create.post', 'POST', '/artists/create', lambda: entity('Artist'), None),
+		('artist.edit.post', 'POST', '/artists/%d/edit' % artist_id, edit('Artist', artist_id), None),
+		('artist.delete', 'DELETE', lambda: '/artists/%d' % create('artists', entity('Artist')), None, None),
+		('show.create.post', 'POST', '/shows/create', lambda: show(venue_id, artist_id, start), None),
+		('api.venues.post', 'POST', '/api/v1/venues', None, lambda: entity('Venue')),
+		('api.venue.delete', 'DELETE', lambda: '/api/v1/venues/%d' % create('venues', entity('Venue')), None, None),
+		('api.artists.post', 'POST', '/api/v1/artists', None, lambda: entity('Artist')),
+		('api.artist.delete', 'DELETE', lambda: '/api/v1/artists/%d' % create('artists', entity('Artist')), None, None),
+		('api.shows.post', 'POST', '/api/v1/shows', None, lambda: show(venue_id, artist_id, start)),
+		('api.shows.batch', 'POST', '/api/v1/shows/batch', None, lambda: {'shows': [show(venue_id, artist_id, start) for _ in range(10)]}),
+	]
+
+def body(value):
+	return value() if callable(value) else value
+
+#----------------------------------------------------------------------------#
+# Statistics.
+#----------------------------------------------------------------------------#
+
+def percentile(ordered, fraction):
+	return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(samples, statuses, seconds=None, sql_counts=None):
+	ordered = sorted(samples)
+	result = {
+		'n': len(ordered),
+		'median_ms': round(statistics.median(ordered), 3),
+		'p95_ms': round(percentile(ordered, 0.95), 3),
+		'p99_ms': round(percentile(ordered, 0.99), 3),
+		'max_ms': round(ordered[-1], 3),
+		'statuses': dict((str(status), statuses.count(status)) for status in sorted(set(statuses))),
+	}
+	if seconds:
+		result['rps'] = round(len(ordered) / seconds, 1)
+	if sql_counts:
+		result['sql_count'] = max(sql_counts)
+	return result
+
+SQL_COUNT = re.compile(r'desc="(\d+) SQL"')
+
+def sql_count(response):
+	match = SQL_COUNT.search(response.headers.get('Server-Timing', ''))
+	return int(match.group(1)) if match else None
+
+#----------------------------------------------------------------------------#
+# Modes.
+#----------------------------------------------------------------------------#
+
+def first_ids():
+	from app import db
+	from models import Venue, Artist, Show
+	ids = [db.session.query(model.id).order_by(model.id).limit(1).scalar() for model in (Venue, Artist, Show)]
+	db.session.remove()
+	if None in ids:
+		sys.exit('The database needs at least one venue, artist and show; run benchmarks/seed.py first.')
+	return ids
+
+def row_counts():
+	from app import db
+	from models import Venue, Artist, Show
+	counts = dict((model.__tablename__, db.session.query(model).count()) for model in (Venue, Artist, Show))
+	db.session.remove()
+	return counts
+
+def run_client(args):
+	from app import app
+	app.config['WTF_CSRF_ENABLED'] = False
+	client = app.test_client()
+	def create(kind, payload):
+		return client.post('/api/v1/' + kind, json=payload).get_json()['id']
+	with app.app_context():
+		routes = read_routes(*first_ids())
+		counts = row_counts()
+	check = None
+	if args.writes:
+		check, writes = write_routes(create)
+		routes += writes
+	results = {}
+	for name, method, path, data, payload in routes:
+		for _ in range(args.warmup):
+			client.open(body(path), method=method, data=body(data), json=body(payload)).close()
+		samples, statuses, sql_counts = [], [], []
+		for _ in range(args.repeat):
+			target, form, document = body(path), body(data), body(payload)
+			started = time.perf_counter()
+			response = client.open(target, method=method, data=form, json=document)
+			response.get_data()
+			samples.append((time.perf_counter() - started) * 1000)
+			statuses.append(response.status_code)
+			if sql_count(response) is not None:
+				sql_counts.append(sql_count(response))
+			response.close()
+		results[name] = summarize(samples, statuses, sql_counts=sql_counts)
+		print_route(name, results[name])
+	if check:
+		check(lambda path: client.get(path).get_json())
+	return counts, results
+
+def fetch(base, method, path, data, payload):
+	headers = {}
+	encoded = None
+	if payload is not None:
+		encoded = json.dumps(payload).encode('utf-8')
+		headers['Content-Type'] = 'application/json'
+	elif data is not None:
+		encoded = urllib.parse.urlencode(data, doseq=True).encode('utf-8')
+		headers['Content-Type'] = 'application/x-www-form-urlencoded'
+	started = time.perf_counter()
+	try:
+		with urllib.request.urlopen(urllib.request.Request(base + path, encoded, headers, method=method)) as response:
+			response.read()
+			status = response.status
+	except urllib.error.HTTPError as e:
+		e.read()
+		status = e.code
+	except OSError:
+		status = 0
+	return (time.perf_counter() - started) * 1000, status
+
+def run_http(args):
+	from app import app
+	base = args.url.rstrip('/')
+	def create(kind, payload):
+		request = urllib.request.Request(base + '/api/v1/' + kind, json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'})
+		with urllib.request.urlopen(request) as response:
+			return json.load(response)['id']
+	with app.app_context():
+		routes = read_routes(*first_ids())
+		counts = row_counts()
+	if args.writes:
+		routes += [route for route in write_routes(create)[1] if route[0].startswith('api.')]
+	results = {}
+	for name, method, path, data, payload in routes:
+		samples, statuses = [], []
+		lock = threading.Lock()
+		def worker(deadline):
+			while time.perf_counter() < deadline:
+				elapsed, status = fetch(base, method, body(path), body(data), body(payload))
+				with lock:
+					samples.append(elapsed)
+					statuses.append(status)
+		with ThreadPoolExecutor(args.concurrency) as pool:
+			list(pool.map(worker, [time.perf_counter() + args.warmup_seconds] * args.concurrency))
+		del samples[:], statuses[:]
+		started = time.perf_counter()
+		with ThreadPoolExecutor(args.concurrency) as pool:
+			list(pool.map(worker, [started + args.seconds] * args.concurrency))
+		results[name] = summarize(samples, statuses, seconds=time.perf_counter() - started)
+		print_route(name, results[name])
+	return counts, results
+
+def print_route(name, stats):
+	print('%-28s %6d %10.2f %10.2f %10.2f %10s %s' % (
+		name, stats['n'], stats['median_ms'], stats['p95_ms'], stats['p99_ms'],
+		stats.get('rps', stats.get('sql_count', '')),
+		' '.join('%s:%d' % item for item in stats['statuses'].items())))
+
+#----------------------------------------------------------------------------#
+# Results.
+#----------------------------------------------------------------------------#
+
+def git(*args):
+	try:
+		return subprocess.check_output(('git',) + args, cwd=os.path.dirname(RESULTS), stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return ''
+
+def save(mode, args, counts, results):
+	commit = git('rev-parse', '--short', 'HEAD') or 'unknown'
+	dirty = bool(git('status', '--porcelain', '--untracked-files=no'))
+	document = {
+		'commit': commit,
+		'dirty': dirty,
+		'time': datetime.utcnow().isoformat(),
+		'mode': mode,
+		'settings': dict((key, value) for key, value in vars(args).items() if key not in ('mode', 'output')),
+		'rows': counts,
+		'routes': results,
+	}
+	path = args.output or os.path.join(RESULTS, '%s%s-%s.json' % (commit, '-dirty' if dirty else '', mode))
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	with open(path, 'w') as f:
+		json.dump(document, f, indent=2, sort_keys=True)
+	print('\nwrote', path)
+
+def change(old, new):
+	return (new - old) / old * 100 if old else 0.0
+
+def compare(args):
+	with open(args.old) as f:
+		old = json.load(f)
+	with open(args.new) as f:
+		new = json.load(f)
+	if old['rows'] != new['rows']:
+		print('warning: row counts differ: %r vs %r' % (old['rows'], new['rows']))
+	print('%s (%s) -> %s (%s)\n' % (old['commit'], old['mode'], new['commit'], new['mode']))
+	# HTTP results also compare throughput, e.g. the WSGI and ASGI servers
+	# (asgi.py) run against the same data.
+	throughput = old['mode'] == new['mode'] == 'http'
+	print('%-28s %10s %10s %8s %10s %10s %8s%s' % ('route', 'median', 'median', '%', 'p95', 'p95', '%',
+		' %10s %10s %8s' % ('rps', 'rps', '%') if throughput else ''))
+	regressions = []
+	for name in sorted(set(old['routes']) | set(new['routes'])):
+		if name not in old['routes'] or name not in new['routes']:
+			print('%-28s %s' % (name, 'only in ' + (args.old if name in old['routes'] else args.new)))
+			continue
+		a, b = old['routes'][name], new['routes'][name]
+		median, p95 = change(a['median_ms'], b['median_ms']), change(a['p95_ms'], b['p95_ms'])
+		flag = ''
+		if median > args.threshold:
+			regressions.append(name)
+			flag = '  slower'
+		rps = ' %10.1f %10.1f %+7.1f%%' % (a['rps'], b['rps'], change(a['rps'], b['rps'])) if throughput else ''
+		print('%-28s %10.2f %10.2f %+7.1f%% %10.2f %10.2f %+7.1f%%%s%s' % (
+			name, a['median_ms'], b['median_ms'], median, a['p95_ms'], b['p95_ms'], p95, rps, flag))
+	if regressions:
+		sys.exit('\n%d route(s) more than %g%% slower: %s' % (len(regressions), args.threshold, ', '.join(regressions)))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	modes = parser.add_subparsers(dest='mode', required=True)
+
+	client = modes.add_parser('client', help='time routes in-process through the Flask test client')
+	client.add_argument('--repeat', type=int, default=50)
+	client.add_argument('--warmup', type=int, default=3)
+
+	http = modes.add_parser('http', help='load a running server over HTTP')
+	http.add_argument('--url', default='http://localhost:5000')
+	http.add_argument('--concurrency', type=int, default=16)
+	http.add_argument('--seconds', type=float, default=10)
+	http.add_argument('--warmup-seconds', type=float, default=1)
+
+	for mode in (client, http):
+		mode.add_argument('--writes', action='store_true', help='also time the create, edit and delete routes (adds rows)')
+		mode.add_argument('--output', help='default: benchmarks/results/<commit>-<mode>.json')
+
+	diff = modes.add_parser('compare', help='compare two result files')
+	diff.add_argument('old')
+	diff.add_argument('new')
+	diff.add_argument('--threshold', type=float, default=10, help='percent median slowdown that fails')
+
+	args = parser.parse_args()
+	if args.mode == 'compare':
+		compare(args)
+	else:
+		print('%-28s %6s %10s %10s %10s %10s' % ('route', 'n', 'median ms', 'p95 ms', 'p99 ms',
+			'rps' if args.mode == 'http' else 'sql'))
+		counts, results = (run_client if args.mode == 'client' else run_http)(args)
+		save(args.mode, args, counts, results)
@@ -0,0 +1,63 @@
+#----------------------------------------------------------------------------#
+# Search latency benchmark.
+#
+# Grows the Venue table from 1k to 1M rows inside a single transaction that is
+# rolled back at the end, and times db_search() at every size. Venues already
+# in the database count towards each size. With the trigram indexes in place
+# latency should stay roughly flat.
+#
+#   python benchmarks/bench_search.py [--sizes 1000,10000,100000,1000000]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from sqlalchemy import func, text
+from app import app, db, db_search
+from refdata import db_add_city
+from models import Venue, Venue_genre
+
+TERMS = ['music', 'hall 4711', 'san francisco, ca', 'jazz', 'zzzz']
+
+def grow(total, current, city_id):
+	db.session.execute(text('''
+		INSERT INTO "Venue" (name, phone, city_id, seeking_talent)
+		SELECT 'Venue ' || md5(i::text) || CASE WHEN i % 97 = 0 THEN ' Music Hall ' || i ELSE '' END,
+			'555-555-5555', :city_id, false
+		FROM generate_series(:start, :stop) AS i
+	'''), {'start': current + 1, 'stop': total, 'city_id': city_id})
+	db.session.execute(text('ANALYZE "Venue"'))
+
+def timed(term, repeat):
+	samples = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		db_search(Venue, Venue_genre, Venue_genre.c.venue_id, term)
+		samples.append((time.perf_counter() - start) * 1000)
+	return statistics.median(samples), max(samples)
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+	parser.add_argument('--repeat', type=int, default=20)
+	args = parser.parse_args()
+
+	with app.app_context():
+		print('%10s  %-20s %10s %10s' % ('rows', 'term', 'median ms', 'max ms'))
+		try:
+			city_id = db_add_city('San Francisco', 'CA')
+			current = db.session.query(func.count(Venue.id)).scalar()
+			for size in [int(x) for x in args.sizes.split(',')]:
+				if size > current:
+					grow(size, current, city_id)
+					current = size
+				for term in TERMS:
+					median, worst = timed(term, args.repeat)
+					print('%10d  %-20s %10.2f %10.2f' % (current, term, median, worst))
+		finally:
+			db.session.rollback()
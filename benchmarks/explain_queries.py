@@ -0,0 +1,83 @@
+#----------------------------------------------------------------------------#
+# Index usage check.
+#
+# Replays the read routes through the Flask test client, captures every SQL
+# statement they issue and runs EXPLAIN on it with sequential scans disabled.
+# A plan that still contains a Seq Scan on one of the checked tables means no
+# index can serve that query. Exits non-zero if any are found.
+#
+#   python benchmarks/explain_queries.py [--verbose]
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from sqlalchemy import event
+from app import app, db
+from models import Venue, Artist
+
+CHECKED_TABLES = {'Show', 'Venue', 'Artist', 'City', 'Genre', 'Venue_genre', 'Artist_genre'}
+
+def routes():
+	venue_id = db.session.query(Venue.id).order_by(Venue.id).limit(1).scalar()
+	artist_id = db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar()
+	db.session.remove()
+	return [
+		('GET', '/venues', None),
+		('GET', '/artists', None),
+		('GET', '/shows', None),
+		('GET', '/venues/%s' % venue_id, None),
+		('GET', '/artists/%s' % artist_id, None),
+		('POST', '/venues/search', {'search_term': 'music'}),
+		('POST', '/artists/search', {'search_term': 'san francisco, ca'}),
+	]
+
+def capture(client, method, url, data):
+	statements = []
+	def record(conn, cursor, statement, parameters, context, executemany):
+		if statement.lstrip().upper().startswith('SELECT'):
+			statements.append((statement, parameters))
+	event.listen(db.engine, 'before_cursor_execute', record)
+	try:
+		client.open(url, method=method, data=data)
+	finally:
+		event.remove(db.engine, 'before_cursor_execute', record)
+	return statements
+
+def seq_scans(plan):
+	if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in CHECKED_TABLES:
+		yield plan['Relation Name']
+	for child in plan.get('Plans', []):
+		for relation in seq_scans(child):
+			yield relation
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--verbose', action='store_true')
+	args = parser.parse_args()
+
+	app.config['WTF_CSRF_ENABLED'] = False
+	failures = 0
+	with app.app_context():
+		client = app.test_client()
+		for method, url, data in routes():
+			for statement, parameters in capture(client, method, url, data):
+				with db.engine.connect() as conn:
+					cursor = conn.connection.cursor()
+					cursor.execute('SET LOCAL enable_seqscan = off')
+					cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+					plan = cursor.fetchone()[0][0]['Plan']
+					cursor.close()
+				scans = sorted(set(seq_scans(plan)))
+				status = 'SEQ SCAN ' + ', '.join(scans) if scans else 'ok'
+				failures += bool(scans)
+				print('%-6s %-28s %s' % (method, url, status))
+				if args.verbose or scans:
+					print('    ' + ' '.join(statement.split()))
+					if args.verbose:
+						print(json.dumps(plan, indent=2))
+	sys.exit(1 if failures else 0)
@@ -0,0 +1,133 @@
+#----------------------------------------------------------------------------#
+# Synthetic data generator.
+#
+# Fills City, Genre, Venue, Artist, Show, the genre association tables and
+# the show summaries at a chosen scale, entirely in Postgres with
+# generate_series, so 10M shows take minutes rather than hours. The data
+# satisfies every constraint: phone formats, unique city and genre names,
+# and no venue or artist booked twice at once (each venue plays once per
+# three-hour slot and the artists of a slot are all different). About half
+# of the shows are in the past.
+#
+#   python benchmarks/seed.py --shows 100000 [--venues N] [--artists N]
+#                             [--cities 500] [--truncate]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from sqlalchemy import text
+from app import app, db
+from forms import VenueForm
+
+# Rows per INSERT ... SELECT; each batch is its own transaction.
+BATCH = 1000000
+
+def timed(label, statement, params=None):
+	started = time.perf_counter()
+	result = db.session.execute(text(statement), params or {})
+	db.session.commit()
+	print('%-40s %8.1fs' % (label, time.perf_counter() - started))
+	return result
+
+def batches(total):
+	for start in range(1, total + 1, BATCH):
+		yield start, min(start + BATCH - 1, total)
+
+def seed(shows, venues, artists, cities):
+	genres = [name for name, label in VenueForm.genres.kwargs['choices']]
+	states = [name for name, label in VenueForm.state.kwargs['choices']]
+
+	timed('genres', '''
+		INSERT INTO "Genre" (name) SELECT unnest(CAST(:genres AS varchar[])) ON CONFLICT DO NOTHING
+	''', {'genres': genres})
+	timed('cities (%d)' % cities, '''
+		INSERT INTO "City" (name, state)
+		SELECT 'City ' || i, (CAST(:states AS varchar[]))[1 + i % :state_count]
+		FROM generate_series(1, :cities) AS i
+		ON CONFLICT DO NOTHING
+	''', {'states': states, 'state_count': len(states), 'cities': cities})
+
+	for table, count, columns, values in (
+		('Venue', venues, 'name, address, phone, city_id, website, seeking_talent, seeking_description',
+			"""'Venue ' || md5(i::text) || CASE WHEN i % 37 = 0 THEN ' Music Hall' ELSE '' END,
+			i || ' Main Street', '555-' || lpad((i % 1000)::text, 3, '0') || '-' || lpad((i % 10000)::text, 4, '0'),
+			city.ids[1 + i % array_length(city.ids, 1)], 'https://venue' || i || '.example.com', i % 3 = 0,
+			CASE WHEN i % 3 = 0 THEN 'Looking for local acts' END"""),
+		('Artist', artists, 'name, phone, city_id, website, seeking_venue, seeking_description',
+			"""'Artist ' || md5(i::text),
+			'555-' || lpad((i % 1000)::text, 3, '0') || '-' || lpad((i % 10000)::text, 4, '0'),
+			city.ids[1 + i % array_length(city.ids, 1)], 'https://artist' || i || '.example.com', i % 4 = 0,
+			CASE WHEN i % 4 = 0 THEN 'Looking for venues' END"""),
+	):
+		for start, stop in batches(count):
+			timed('%s %d-%d' % (table.lower(), start, stop), '''
+				INSERT INTO "{0}" ({1})
+				SELECT {2}
+				FROM generate_series(:start, :stop) AS i, (SELECT array_agg(id ORDER BY id) AS ids FROM "City") AS city
+			'''.format(table, columns, values), {'start': start, 'stop': stop})
+
+	# One to three genres per venue and artist.
+	for table, key, parent in (('Venue_genre', 'venue_id', 'Venue'), ('Artist_genre', 'artist_id', 'Artist')):
+		timed(table, '''
+			INSERT INTO "{0}" ({1}, genre_id)
+			SELECT DISTINCT p.id, genre.ids[1 + (p.id * k) % array_length(genre.ids, 1)]
+			FROM "{2}" p, generate_series(1, 3) AS k, (SELECT array_agg(id ORDER BY id) AS ids FROM "Genre") AS genre
+			WHERE k <= 1 + p.id % 3
+			ON CONFLICT DO NOTHING
+		'''.format(table, key, parent))
+
+	# Show i goes to venue i mod V in slot i / V. Within a slot the artist is
+	# (venue + 7 * slot) mod A, so all of a slot's artists differ as long as
+	# A >= V. A show starts up to an hour into its slot and lasts two hours.
+	slots = -(-shows // venues)
+	for start, stop in batches(shows):
+		timed('shows %d-%d' % (start, stop), '''
+			INSERT INTO "Show" (venue_id, artist_id, start_time, end_time)
+			SELECT ids.venues[1 + v], ids.artists[1 + (v + 7 * slot) % :artists], t, t + interval '2 hours'
+			FROM generate_series(:start, :stop) AS i,
+				(SELECT (SELECT array_agg(id ORDER BY id) FROM "Venue") AS venues,
+					(SELECT array_agg(id ORDER BY id) FROM "Artist") AS artists) AS ids,
+				LATERAL (SELECT (i - 1) % :venues AS v, (i - 1) / :venues AS slot) AS position,
+				LATERAL (SELECT date_trunc('hour', localtimestamp) + (slot - :slots / 2) * interval '3 hours'
+					+ ((i * 17) % 60) * interval '1 minute' AS t) AS start_time
+		''', {'start': start, 'stop': stop, 'venues': venues, 'artists': artists, 'slots': slots})
+
+	for table, key in (('Venue_show_summary', 'venue_id'), ('Artist_show_summary', 'artist_id')):
+		timed(table, '''
+			INSERT INTO "{0}" ({1}, upcoming_shows, past_shows, next_show_time)
+			SELECT {1},
+				count(*) FILTER (WHERE start_time >= localtimestamp),
+				count(*) FILTER (WHERE start_time < localtimestamp),
+				min(start_time) FILTER (WHERE start_time >= localtimestamp)
+			FROM "Show" GROUP BY {1}
+			ON CONFLICT ({1}) DO UPDATE SET upcoming_shows = excluded.upcoming_shows,
+				past_shows = excluded.past_shows, next_show_time = excluded.next_show_time
+		'''.format(table, key))
+	timed('analyze', 'ANALYZE')
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--shows', type=int, default=10000)
+	parser.add_argument('--venues', type=int, help='default: shows / 20')
+	parser.add_argument('--artists', type=int, help='default: twice the venues')
+	parser.add_argument('--cities', type=int, default=500)
+	parser.add_argument('--truncate', action='store_true', help='empty every table first')
+	args = parser.parse_args()
+
+	venues = args.venues or max(1, args.shows // 20)
+	artists = args.artists or 2 * venues
+	if artists < venues:
+		parser.error('--artists must be at least --venues so no artist is double-booked')
+
+	with app.app_context():
+		if args.truncate:
+			timed('truncate', '''
+				TRUNCATE "Show", "Venue_show_summary", "Artist_show_summary", "Venue_genre", "Artist_genre",
+					"Venue", "Artist", "City", "Genre" RESTART IDENTITY
+			''')
+		seed(args.shows, venues, artists, args.cities)
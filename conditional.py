@@ -0,0 +1,52 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import Response, g, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def last_modified_of(values):
+	times = [x for x in values if isinstance(x, datetime)]
+	return max(times).replace(tzinfo=timezone.utc) if times else None
+
+def etag_of(full_path, values):
+	return hashlib.sha1(repr((full_path, values)).encode('utf-8')).hexdigest()
+
+# `if_none_match` is a werkzeug ETags set (empty when the header is absent)
+# and `if_modified_since` an aware datetime or None.
+def is_not_modified(if_none_match, if_modified_since, etag, last_modified):
+	if if_none_match:
+		return if_none_match.contains(etag)
+	return last_modified is not None and if_modified_since is not None \
+		and last_modified.replace(microsecond=0) <= if_modified_since
+
+# Answer GET requests with validators computed by `version(**view_args)`,
+# which returns a tuple of cheap aggregates (update times, row counts, ...)
+# that changes whenever the rendered page would, or None if the page does not
+# exist. Naive datetimes in the tuple are UTC and the newest one becomes
+# Last-Modified. A matching If-None-Match, or If-Modified-Since when no ETag
+# was sent, gets a 304 before the view runs, and otherwise the view finds the
+# tuple in g.page_version. Requests with pending flash messages are passed
+# straight through.
+def conditional(version):
+	def decorator(f):
+		@wraps(f)
+		def wrapper(**kwargs):
+			if '_flashes' in session:
+				return f(**kwargs)
+			values = version(**kwargs)
+			if values is None:
+				return f(**kwargs)
+			etag = etag_of(request.full_path, values)
+			last_modified = last_modified_of(values)
+			not_modified = is_not_modified(request.if_none_match, request.if_modified_since, etag, last_modified)
+			g.page_version = values
+			response = Response(status=304) if not_modified else make_response(f(**kwargs))
+			response.set_etag(etag)
+			response.last_modified = last_modified
+			response.cache_control.no_cache = True
+			return response
+		return wrapper
+	return decorator
@@ -0,0 +1,39 @@
+from datetime import datetime
+from functools import lru_cache
+import babel.dates
+import dateutil.parser
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+
+# babel.dates.format_datetime parses its pattern string and looks up the
+# locale on every call. Patterns and locales are parsed once here instead,
+# and formatted values are memoized per (datetime, format, locale), since
+# the same show time appears on the listing and on both detail pages.
+
+PATTERNS = {
+	'full': "EEEE MMMM, d, y 'at' h:mma",
+	'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=None)
+def compiled_pattern(format):
+	return babel.dates.parse_pattern(PATTERNS.get(format, format))
+
+@lru_cache(maxsize=None)
+def parsed_locale(locale):
+	return babel.Locale.parse(locale)
+
+# Patterns carry no time zone fields, so naive datetimes are formatted as
+# they are, matching what format_datetime did for them.
+@lru_cache(maxsize=4096)
+def format_datetime_value(value, format='medium', locale='en'):
+	return compiled_pattern(format).apply(value, parsed_locale(locale))
+
+# Jinja filter. Views pass datetimes straight through; strings are still
+# accepted and parsed for anything that hands the template text.
+def format_datetime(value, format='medium', locale='en'):
+	if not isinstance(value, datetime):
+		value = dateutil.parser.parse(value)
+	return format_datetime_value(value, format, locale)
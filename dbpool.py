@@ -0,0 +1,98 @@
+import time
+from threading import Lock
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+# QueuePool that records how long each checkout waited for a connection and
+# how many gave up after pool_timeout. Everything else (size, checked out,
+# overflow) the pool already tracks.
+class TimedQueuePool(QueuePool):
+	def __init__(self, *args, **kwargs):
+		super(TimedQueuePool, self).__init__(*args, **kwargs)
+		self.stats_lock = Lock()
+		self.waits = 0
+		self.wait_seconds = 0.0
+		self.max_wait_seconds = 0.0
+		self.timeouts = 0
+
+	def _do_get(self):
+		started = time.perf_counter()
+		timed_out = False
+		try:
+			return super(TimedQueuePool, self)._do_get()
+		except TimeoutError:
+			timed_out = True
+			raise
+		finally:
+			waited = time.perf_counter() - started
+			with self.stats_lock:
+				self.waits += 1
+				self.wait_seconds += waited
+				self.max_wait_seconds = max(self.max_wait_seconds, waited)
+				self.timeouts += timed_out
+
+# SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings. In PgBouncer mode the
+# pooler owns the connections, so the app opens one per checkout (NullPool)
+# and sends no startup options, which transaction pooling rejects; set
+# statement_timeout on the database role instead. psycopg2 never uses
+# server-side prepared statements, so nothing else needs turning off.
+def engine_options(config):
+	if config['DB_PGBOUNCER']:
+		return {'poolclass': NullPool}
+	options = {
+		'poolclass': TimedQueuePool,
+		'pool_size': config['DB_POOL_SIZE'],
+		'max_overflow': config['DB_MAX_OVERFLOW'],
+		'pool_timeout': config['DB_POOL_TIMEOUT'],
+		'pool_recycle': config['DB_POOL_RECYCLE'],
+		'pool_pre_ping': config['DB_POOL_PRE_PING'],
+	}
+	if config['DB_STATEMENT_TIMEOUT_MS']:
+		options['connect_args'] = {'options': '-c statement_timeout=%d' % config['DB_STATEMENT_TIMEOUT_MS']}
+	return options
+
+# The same settings for the async mode's asyncpg engines (asgi.py), which
+# keep SQLAlchemy's default async queue pool. asyncpg caches prepared
+# statements per connection, which breaks when PgBouncer hands the next
+# transaction to another server connection, so both caches are off there.
+def async_engine_options(config):
+	if config['DB_PGBOUNCER']:
+		return {'poolclass': NullPool, 'connect_args': {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}}
+	options = {
+		'pool_size': config['DB_POOL_SIZE'],
+		'max_overflow': config['DB_MAX_OVERFLOW'],
+		'pool_timeout': config['DB_POOL_TIMEOUT'],
+		'pool_recycle': config['DB_POOL_RECYCLE'],
+		'pool_pre_ping': config['DB_POOL_PRE_PING'],
+	}
+	if config['DB_STATEMENT_TIMEOUT_MS']:
+		options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT_MS'])}}
+	return options
+
+def init_app(app):
+	app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+def pool_stats(pool):
+	if not isinstance(pool, QueuePool):
+		return {'pool': type(pool).__name__}
+	stats = {
+		'pool': type(pool).__name__,
+		'size': pool.size(),
+		'checked_in': pool.checkedin(),
+		'checked_out': pool.checkedout(),
+		'overflow': max(0, pool.overflow()),
+		'max_overflow': pool._max_overflow,
+	}
+	if isinstance(pool, TimedQueuePool):
+		with pool.stats_lock:
+			stats.update({
+				'checkouts': pool.waits,
+				'wait_seconds_total': pool.wait_seconds,
+				'wait_seconds_max': pool.max_wait_seconds,
+				'timeouts': pool.timeouts,
+			})
+	return stats
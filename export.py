@@ -0,0 +1,70 @@
+import csv
+import io
+from models import Venue, Artist, Show, db
+from api import dumps
+
+#----------------------------------------------------------------------------#
+# Show calendar export.
+#----------------------------------------------------------------------------#
+
+# Rows are read through a server-side cursor `batch_size` at a time and
+# written out as they arrive, so memory stays flat however many shows exist.
+
+COLUMNS = ('id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name')
+
+def show_rows(batch_size=1000):
+	return db.session.query(
+		Show.id,
+		Show.start_time,
+		Show.venue_id,
+		Venue.name.label('venue_name'),
+		Show.artist_id,
+		Artist.name.label('artist_name'),
+	).join(Venue, Show.venue_id == Venue.id) \
+		.join(Artist, Show.artist_id == Artist.id) \
+		.order_by(Show.start_time, Show.id) \
+		.yield_per(batch_size)
+
+def ndjson_lines(rows):
+	for row in rows:
+		yield dumps({
+			'id': row.id,
+			'start_time': row.start_time.isoformat(),
+			'venue_id': row.venue_id,
+			'venue_name': row.venue_name,
+			'artist_id': row.artist_id,
+			'artist_name': row.artist_name,
+		}) + '\n'
+
+def csv_lines(rows):
+	buffer = io.StringIO()
+	writer = csv.writer(buffer)
+	writer.writerow(COLUMNS)
+	yield buffer.getvalue()
+	buffer.seek(0)
+	buffer.truncate()
+	for row in rows:
+		writer.writerow((row.id, row.start_time.isoformat(), row.venue_id, row.venue_name, row.artist_id, row.artist_name))
+		yield buffer.getvalue()
+		buffer.seek(0)
+		buffer.truncate()
+
+# Join lines into ~`size` character chunks so a streamed response is not
+# written to the socket one row at a time.
+def chunked(lines, size=65536):
+	chunk = []
+	length = 0
+	for line in lines:
+		chunk.append(line)
+		length += len(line)
+		if length >= size:
+			yield ''.join(chunk)
+			chunk = []
+			length = 0
+	if chunk:
+		yield ''.join(chunk)
+
+FORMATS = {
+	'ndjson': (ndjson_lines, 'application/x-ndjson'),
+	'csv': (csv_lines, 'text/csv'),
+}
@@ -0,0 +1,88 @@
+from models import Venue, Artist, Show, db
+from pagecache import page_cache
+
+#----------------------------------------------------------------------------#
+# iCalendar feeds.
+#----------------------------------------------------------------------------#
+
+# A venue's or artist's upcoming shows as an RFC 5545 calendar that fans can
+# subscribe to. Show times are naive local times and go out as floating
+# times (no time zone), which calendar clients show as they are.
+
+def upcoming_show_rows(show_key, entity_id, now, batch_size=500):
+	return db.session.query(
+		Show.id,
+		Show.start_time,
+		Show.end_time,
+		Show.updated_at,
+		Show.venue_id,
+		Venue.name.label('venue_name'),
+		Venue.address.label('venue_address'),
+		Show.artist_id,
+		Artist.name.label('artist_name'),
+	).join(Venue, Show.venue_id == Venue.id) \
+		.join(Artist, Show.artist_id == Artist.id) \
+		.filter(show_key == entity_id, Show.start_time >= now) \
+		.order_by(Show.start_time, Show.id) \
+		.yield_per(batch_size)
+
+def ical_text(value):
+	return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+		.replace('\r\n', '\\n').replace('\n', '\\n')
+
+def ical_time(value):
+	return value.strftime('%Y%m%dT%H%M%S')
+
+# Content lines end in CRLF and are folded at 75 octets, continuation lines
+# starting with a space, without splitting a UTF-8 sequence.
+def ical_line(line):
+	encoded = line.encode('utf-8')
+	parts = []
+	limit = 75
+	while len(encoded) > limit:
+		cut = limit
+		while encoded[cut] & 0xC0 == 0x80:
+			cut -= 1
+		parts.append(encoded[:cut].decode('utf-8'))
+		encoded = encoded[cut:]
+		limit = 74
+	parts.append(encoded.decode('utf-8'))
+	return '\r\n '.join(parts) + '\r\n'
+
+# `base_url` ends in a slash; `link(row)` is the path of the page each event
+# links to. Updated_at is UTC and becomes the event's DTSTAMP.
+def calendar_lines(name, rows, base_url, host, link):
+	for line in (
+		'BEGIN:VCALENDAR',
+		'VERSION:2.0',
+		'PRODID:-//Fyyur//Show calendar//EN',
+		'CALSCALE:GREGORIAN',
+		'METHOD:PUBLISH',
+		'X-WR-CALNAME:' + ical_text(name),
+	):
+		yield ical_line(line)
+	for row in rows:
+		location = row.venue_name + (', ' + row.venue_address if row.venue_address else '')
+		for line in (
+			'BEGIN:VEVENT',
+			'UID:show-%d@%s' % (row.id, host),
+			'DTSTAMP:%sZ' % ical_time(row.updated_at),
+			'DTSTART:' + ical_time(row.start_time),
+			'DTEND:' + ical_time(row.end_time),
+			'SUMMARY:' + ical_text('%s at %s' % (row.artist_name, row.venue_name)),
+			'LOCATION:' + ical_text(location),
+			'URL:' + base_url + link(row),
+			'END:VEVENT',
+		):
+			yield ical_line(line)
+	yield ical_line('END:VCALENDAR')
+
+# Pass chunks through while keeping a copy, and store the whole body under
+# `key` once the last chunk has gone out. A client that disconnects early
+# closes the generator before that, so a partial body is never cached.
+def cached_stream(key, chunks, ttl):
+	parts = []
+	for chunk in chunks:
+		parts.append(chunk)
+		yield chunk
+	page_cache.set(key, ''.join(parts), ttl=ttl)
@@ -1,20 +1,58 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, ValidationError
-from wtforms.validators import DataRequired, AnyOf, URL, Optional
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField, ValidationError
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, NumberRange
+from werkzeug.datastructures import MultiDict
 import re
+
+from recurrence import occurrences
+
+SHOW_MINUTES = 120
+
 class ShowForm(Form):
     artist_id = StringField(
         'artist_id'
     )
+    def validate_artist_id(self, field):
+        if not str(field.data).strip().isdigit():
+            raise ValidationError('Not a valid id.')
     venue_id = StringField(
         'venue_id'
     )
+    def validate_venue_id(self, field):
+        if not str(field.data).strip().isdigit():
+            raise ValidationError('Not a valid id.')
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # Minutes; shows without one are booked for SHOW_MINUTES.
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=24 * 60)],
+        default=SHOW_MINUTES
+    )
+    # Optional RRULE repeating the show, see recurrence.py. Validation
+    # expands it; the start times are kept and handed on in `data` under
+    # 'occurrences', so that show_series does not expand the rule again.
+    recurrence = StringField(
+        'recurrence', validators=[Optional()]
+    )
+    occurrences = None
+    def validate_recurrence(self, field):
+        if self.start_time.data is None:
+            return
+        try:
+            self.occurrences = occurrences(field.data, self.start_time.data)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    @property
+    def data(self):
+        data = super(ShowForm, self).data
+        data['occurrences'] = self.occurrences
+        return data
 
 class VenueForm(Form):
     name = StringField(
@@ -242,3 +280,11 @@ class ArtistForm(Form):
             'seeking_description'
      )
 
+# Build a form from a plain mapping (a JSON object, an import row) rather
+# than the request, with CSRF off. List values become repeated fields.
+def form_from_dict(form_class, data):
+    formdata = MultiDict()
+    for key, value in data.items():
+        for item in (value if isinstance(value, list) else [value]):
+            formdata.add(key, item if isinstance(item, bool) else '' if item is None else str(item))
+    return form_class(formdata=formdata, meta={'csrf': False})
@@ -0,0 +1,213 @@
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from itertools import islice
+from sqlalchemy import func, insert, select
+
+from forms import VenueForm, ArtistForm, ShowForm, form_from_dict
+from models import Venue, Artist, Venue_genre, Artist_genre, db
+from pagecache import page_cache
+from queries import venue_values, artist_values, show_series, db_existing_ids, db_insert_shows, show_page_keys
+from refdata import db_add_genre, db_add_cities
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+# Files are read one record at a time and handled `chunk_size` records per
+# transaction. Each record goes through the same form as the HTML pages;
+# records that fail are written to a rejects file with their line number
+# instead of aborting the import. Genres and cities are resolved once per
+# chunk, ids are allocated from the table's sequence in one query, and rows
+# go in with a single executemany per table (which psycopg2 batches into
+# multi-row VALUES; shows use one multi-row INSERT, see load_shows). After each chunk commits, a checkpoint records how many
+# records are done so an interrupted import can pick up where it stopped.
+
+#----------------------------------------------------------------------------#
+# Readers.
+#----------------------------------------------------------------------------#
+
+# Both readers yield (line number, record, error) with record None when the
+# line could not be parsed.
+
+def read_ndjson(path):
+	with open(path, encoding='utf-8') as f:
+		for line_no, line in enumerate(f, 1):
+			if not line.strip():
+				continue
+			try:
+				record = json.loads(line)
+			except ValueError as e:
+				yield line_no, None, str(e)
+				continue
+			if isinstance(record, dict):
+				yield line_no, record, None
+			else:
+				yield line_no, None, 'Expected a JSON object.'
+
+# CSV columns are the form field names; `genres` holds several names
+# separated by ';'. Boolean columns accept the usual spellings of false.
+FALSE_VALUES = ('', '0', 'f', 'false', 'n', 'no')
+
+def read_csv(path):
+	with open(path, encoding='utf-8', newline='') as f:
+		reader = csv.DictReader(f)
+		for record in reader:
+			if 'genres' in record:
+				record['genres'] = [x.strip() for x in (record['genres'] or '').split(';') if x.strip()]
+			for field in ('seeking_talent', 'seeking_venue'):
+				if field in record:
+					record[field] = (record[field] or '').strip().lower() not in FALSE_VALUES
+			yield reader.line_num, record, None
+
+READERS = {
+	'ndjson': read_ndjson,
+	'csv': read_csv,
+}
+
+#----------------------------------------------------------------------------#
+# Loaders.
+#----------------------------------------------------------------------------#
+
+# A loader takes the validated form data of one chunk as (line number, data)
+# pairs, inserts what it can and returns the rejects it found along the way
+# plus the page cache keys to invalidate once the chunk commits.
+
+def allocate_ids(model, count):
+	return db.session.execute(
+		select(func.nextval(func.pg_get_serial_sequence('"%s"' % model.__tablename__, 'id')))
+			.select_from(func.generate_series(1, count))
+	).scalars().all()
+
+def load_entities(model, genre_table, genre_key, values, records):
+	genre_ids = {}
+	names = list(dict.fromkeys(name for line_no, data in records for name in data['genres']))
+	if names:
+		genre_ids = dict(zip(names, db_add_genre(names)))
+	city_ids = db_add_cities([(data['city'], data['state']) for line_no, data in records])
+
+	rows = []
+	genre_rows = []
+	for entity_id, (line_no, data) in zip(allocate_ids(model, len(records)), records):
+		rows.append(dict(values(data, city_ids[(data['city'], data['state'])]), id=entity_id))
+		genre_rows += [{genre_key.key: entity_id, 'genre_id': genre_ids[name]} for name in dict.fromkeys(data['genres'])]
+	db.session.execute(insert(model), rows)
+	if genre_rows:
+		db.session.execute(insert(genre_table), genre_rows)
+	return [], []
+
+def load_venues(records):
+	return load_entities(Venue, Venue_genre, Venue_genre.c.venue_id, venue_values, records)
+
+def load_artists(records):
+	return load_entities(Artist, Artist_genre, Artist_genre.c.artist_id, artist_values, records)
+
+# Shows reference existing venues and artists; both id sets are checked with
+# one query each per chunk and shows pointing at missing rows are rejected.
+# A record with a recurrence rule stands for all of its occurrences. The
+# rest go in as one multi-row INSERT (see db_insert_shows). Occurrences left
+# out as double bookings are rejected under their record's line, while the
+# record's other occurrences stay in.
+def load_shows(records):
+	rejects = []
+	series = [(line_no, show_series(data)) for line_no, data in records]
+	if not series:
+		return rejects, []
+
+	venue_ids, artist_ids = db_existing_ids([row for line_no, rows in series for row in rows])
+	shows = []
+	for line_no, rows in series:
+		errors = {}
+		if rows[0]['venue_id'] not in venue_ids:
+			errors['venue_id'] = ['No venue with this id.']
+		if rows[0]['artist_id'] not in artist_ids:
+			errors['artist_id'] = ['No artist with this id.']
+		if errors:
+			rejects.append((line_no, errors))
+		else:
+			shows.append((line_no, rows))
+	if not shows:
+		return rejects, []
+
+	lines = [line_no for line_no, rows_of_line in shows for row in rows_of_line]
+	rows = [row for line_no, rows_of_line in shows for row in rows_of_line]
+	inserted, skipped = db_insert_shows(rows)
+	starts = defaultdict(list)
+	for position in skipped:
+		starts[lines[position]].append(rows[position]['start_time'])
+	for line_no, skipped_starts in starts.items():
+		rejects.append((line_no, {'start_time': ['The venue or the artist already has a show at %s.' % ', '.join(x.isoformat() for x in skipped_starts)]}))
+	return rejects, show_page_keys(inserted)
+
+KINDS = {
+	'venues': (VenueForm, load_venues),
+	'artists': (ArtistForm, load_artists),
+	'shows': (ShowForm, load_shows),
+}
+
+#----------------------------------------------------------------------------#
+# Driver.
+#----------------------------------------------------------------------------#
+
+def read_checkpoint(path):
+	try:
+		with open(path) as f:
+			return json.load(f)['records']
+	except FileNotFoundError:
+		return 0
+
+# Written to a temporary file and renamed over the old one, so a crash never
+# leaves a half-written checkpoint behind.
+def write_checkpoint(path, records):
+	partial = path + '.tmp'
+	with open(partial, 'w') as f:
+		json.dump({'records': records}, f)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(partial, path)
+
+# Import `records` from a reader and yield a report per committed chunk. `skip` records at
+# the start of the file are passed over (they were imported by an earlier
+# run); `rejects` is a writable file for records that failed.
+def import_records(kind, records, rejects, chunk_size=1000, skip=0):
+	form_class, load = KINDS[kind]
+	records = islice(records, skip, None)
+	done = skip
+	while True:
+		chunk = list(islice(records, chunk_size))
+		if not chunk:
+			return
+		started = time.monotonic()
+		valid = []
+		failed = []
+		for line_no, record, error in chunk:
+			if error is not None:
+				failed.append((line_no, {'record': [error]}))
+				continue
+			form = form_from_dict(form_class, record)
+			if form.validate():
+				valid.append((line_no, form.data))
+			else:
+				failed.append((line_no, form.errors))
+		if valid:
+			try:
+				rejected, page_keys = load(valid)
+				db.session.commit()
+			except Exception:
+				db.session.rollback()
+				raise
+			failed += rejected
+			page_cache.invalidate(*page_keys)
+		for line_no, errors in sorted(failed, key=lambda x: x[0]):
+			rejects.write(json.dumps({'line': line_no, 'errors': errors}) + '\n')
+		rejects.flush()
+		done += len(chunk)
+		yield {
+			'records': len(chunk),
+			'imported': len(chunk) - len(failed),
+			'rejected': len(failed),
+			'seconds': time.monotonic() - started,
+			'done': done,
+		}
@@ -0,0 +1,118 @@
+import json
+import logging
+import time
+from collections import Counter
+from logging import Formatter, FileHandler
+from flask import current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import metrics
+
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#----------------------------------------------------------------------------#
+
+# Every request records its wall time, the number and total time of the SQL
+# statements it ran and the time spent rendering templates. The figures go
+# out as a Server-Timing header (visible in the browser's dev tools) and as
+# one JSON line per request in REQUEST_LOG. Statements slower than
+# SLOW_QUERY_MS are written to SLOW_QUERY_LOG along with the route that ran
+# them. `sql_max_repeats` counts the most frequent statement text within a
+# request, which is what an N+1 pattern pushes up.
+
+request_log = logging.getLogger('fyyur.requests')
+slow_query_log = logging.getLogger('fyyur.slow_queries')
+
+def current_stats():
+	if has_request_context():
+		return g.get('request_stats')
+	return None
+
+# The start time lives on the statement's execution context, which goes
+# away with it, so a statement that fails leaves nothing behind on the
+# pooled connection.
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement(conn, cursor, statement, parameters, context, executemany):
+	context._query_start = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def finish_statement(conn, cursor, statement, parameters, context, executemany):
+	elapsed = time.perf_counter() - context._query_start
+	stats = current_stats()
+	if stats is None:
+		return
+	stats['sql_count'] += 1
+	stats['sql_time'] += elapsed
+	stats['statements'][statement] += 1
+	if elapsed * 1000 >= stats['slow_query_ms']:
+		slow_query_log.warning(json.dumps({
+			'endpoint': request.endpoint,
+			'route': request.url_rule.rule if request.url_rule else None,
+			'method': request.method,
+			'path': request.full_path.rstrip('?'),
+			'ms': round(elapsed * 1000, 2),
+			'statement': statement,
+		}))
+
+# Flask renders through Template.render; includes and extends run inside it,
+# so each page is timed once.
+class TimedTemplate(Template):
+	def render(self, *args, **kwargs):
+		stats = current_stats()
+		if stats is None:
+			return super(TimedTemplate, self).render(*args, **kwargs)
+		started = time.perf_counter()
+		try:
+			return super(TimedTemplate, self).render(*args, **kwargs)
+		finally:
+			stats['render_time'] += time.perf_counter() - started
+
+def start_request():
+	g.request_stats = {
+		'started': time.perf_counter(),
+		'sql_count': 0,
+		'sql_time': 0.0,
+		'render_time': 0.0,
+		'statements': Counter(),
+		'slow_query_ms': current_app.config['SLOW_QUERY_MS'],
+	}
+
+def finish_request(response):
+	stats = g.get('request_stats')
+	if stats is None:
+		return response
+	total = time.perf_counter() - stats['started']
+	metrics.observe(request.endpoint or 'unmatched', request.method, response.status_code, total)
+	response.headers.add('Server-Timing', 'total;dur=%.1f, sql;dur=%.1f;desc="%d SQL", render;dur=%.1f' % (
+		total * 1000, stats['sql_time'] * 1000, stats['sql_count'], stats['render_time'] * 1000))
+	request_log.info(json.dumps({
+		'method': request.method,
+		'path': request.full_path.rstrip('?'),
+		'endpoint': request.endpoint,
+		'status': response.status_code,
+		'ms': round(total * 1000, 2),
+		'sql_count': stats['sql_count'],
+		'sql_ms': round(stats['sql_time'] * 1000, 2),
+		'render_ms': round(stats['render_time'] * 1000, 2),
+		'sql_max_repeats': max(stats['statements'].values()) if stats['statements'] else 0,
+	}))
+	return response
+
+def file_logger(logger, path, level):
+	logger.setLevel(level)
+	logger.propagate = False
+	if path:
+		handler = FileHandler(path)
+		handler.setFormatter(Formatter('%(asctime)s %(message)s'))
+	else:
+		handler = logging.NullHandler()
+	logger.addHandler(handler)
+
+def init_app(app):
+	file_logger(request_log, app.config['REQUEST_LOG'], logging.INFO)
+	file_logger(slow_query_log, app.config['SLOW_QUERY_LOG'], logging.WARNING)
+	app.jinja_env.template_class = TimedTemplate
+	app.before_request(start_request)
+	app.after_request(finish_request)
@@ -0,0 +1,41 @@
+import hmac
+from flask import Blueprint, Response, abort, current_app, request
+
+from api import json_response
+from dbpool import pool_stats
+from metrics import render_metrics
+from models import db
+from routing import REPLICA
+
+internal = Blueprint('internal', __name__, url_prefix='/internal')
+# /metrics sits where Prometheus looks for it, behind the same check.
+prometheus = Blueprint('prometheus', __name__)
+
+#----------------------------------------------------------------------------#
+# Internal endpoints.
+#----------------------------------------------------------------------------#
+
+# Operational data for monitoring, not for the public: requests need
+# `Authorization: Bearer <INTERNAL_TOKEN>`. Loopback requests are let through
+# only with INTERNAL_TRUST_LOOPBACK, as a proxy in front makes every request
+# look local.
+def require_internal():
+	if current_app.config['INTERNAL_TRUST_LOOPBACK'] and request.remote_addr in ('127.0.0.1', '::1'):
+		return
+	token = current_app.config['INTERNAL_TOKEN']
+	if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+		abort(404)
+
+internal.before_request(require_internal)
+prometheus.before_request(require_internal)
+
+@internal.route('/pool')
+def pool():
+	stats = pool_stats(db.engine.pool)
+	if REPLICA in current_app.config['SQLALCHEMY_BINDS']:
+		stats[REPLICA] = pool_stats(db.get_engine(bind=REPLICA).pool)
+	return json_response(stats)
+
+@prometheus.route('/metrics')
+def prometheus_metrics():
+	return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,195 @@
+import glob
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock
+from flask import current_app, has_app_context
+
+from dbpool import pool_stats
+from models import db
+from pagecache import page_cache
+from refdata import reference_cache
+from routing import REPLICA
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# Request counters and per-endpoint latency histograms are kept in process
+# memory; recording one request is a bisect and a few dict updates under a
+# lock. Under a multi-process server set METRICS_DIR: every worker then
+# writes a snapshot of its counters to <METRICS_DIR>/<pid>.json at most
+# every METRICS_FLUSH_SECONDS, and /metrics, whichever worker serves it,
+# adds the snapshots up. Counters of workers that have exited stay in the
+# totals; their pool gauges are dropped once the file goes stale.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics(object):
+	def __init__(self):
+		self.lock = Lock()
+		self.requests = Counter()
+		self.latency = {}
+		self.directory = None
+		self.flush_seconds = 5
+		self.flushed_at = 0.0
+		self.app = None
+
+	def init_app(self, app):
+		self.app = app
+		self.directory = app.config['METRICS_DIR'] or None
+		self.flush_seconds = app.config['METRICS_FLUSH_SECONDS']
+		if self.directory:
+			os.makedirs(self.directory, exist_ok=True)
+
+	# Bucket i counts durations in (BUCKETS[i-1], BUCKETS[i]]; the extra last
+	# bucket is +Inf and the final element the sum of durations.
+	def observe(self, endpoint, method, status, seconds):
+		with self.lock:
+			self.requests[(endpoint, method, status)] += 1
+			histogram = self.latency.get(endpoint)
+			if histogram is None:
+				histogram = self.latency[endpoint] = [0] * (len(BUCKETS) + 1) + [0.0]
+			histogram[bisect_left(BUCKETS, seconds)] += 1
+			histogram[-1] += seconds
+		if self.directory and time.monotonic() - self.flushed_at >= self.flush_seconds:
+			self.flush()
+
+	# Pool gauges need the app's engines. asgi.py's handlers record their
+	# requests, and may flush, outside any Flask context.
+	def snapshot(self):
+		if not has_app_context():
+			with self.app.app_context():
+				return self.snapshot()
+		pools = {'primary': pool_stats(db.engine.pool)}
+		if REPLICA in current_app.config['SQLALCHEMY_BINDS']:
+			pools[REPLICA] = pool_stats(db.get_engine(bind=REPLICA).pool)
+		with self.lock:
+			return {
+				'pid': os.getpid(),
+				'time': time.time(),
+				'requests': [list(key) + [count] for key, count in self.requests.items()],
+				'latency': dict((endpoint, list(histogram)) for endpoint, histogram in self.latency.items()),
+				'caches': {
+					'page': page_cache.stats(),
+					'reference': reference_cache.stats(),
+				},
+				'pools': pools,
+			}
+
+	# Written to a temporary file and renamed, so readers never see half a
+	# snapshot.
+	def flush(self):
+		self.flushed_at = time.monotonic()
+		path = os.path.join(self.directory, '%d.json' % os.getpid())
+		with open(path + '.tmp', 'w') as f:
+			json.dump(self.snapshot(), f)
+		os.replace(path + '.tmp', path)
+
+	def snapshots(self):
+		if not self.directory:
+			return [self.snapshot()]
+		self.flush()
+		snapshots = []
+		for path in glob.glob(os.path.join(self.directory, '*.json')):
+			try:
+				with open(path) as f:
+					snapshots.append(json.load(f))
+			except (OSError, ValueError):
+				continue
+		return snapshots
+
+metrics = Metrics()
+
+#----------------------------------------------------------------------------#
+# Prometheus text format.
+#----------------------------------------------------------------------------#
+
+def label_value(value):
+	return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def sample(name, labels, value):
+	if labels:
+		name += '{%s}' % ','.join('%s="%s"' % (key, label_value(labels[key])) for key in labels)
+	return '%s %s' % (name, repr(float(value)) if isinstance(value, float) else value)
+
+def family(lines, name, kind, description, samples):
+	lines.append('# HELP %s %s' % (name, description))
+	lines.append('# TYPE %s %s' % (name, kind))
+	lines.extend(samples)
+
+# pool_stats() field, metric, type, help. Reported per worker, and only for
+# workers whose snapshot is recent.
+POOL_METRICS = (
+	('size', 'fyyur_db_pool_size', 'gauge', 'Connections the pool keeps open.'),
+	('checked_in', 'fyyur_db_pool_checked_in', 'gauge', 'Idle connections in the pool.'),
+	('checked_out', 'fyyur_db_pool_checked_out', 'gauge', 'Connections in use.'),
+	('overflow', 'fyyur_db_pool_overflow', 'gauge', 'Connections open beyond the pool size.'),
+	('checkouts', 'fyyur_db_pool_checkouts_total', 'counter', 'Connection checkouts.'),
+	('wait_seconds_total', 'fyyur_db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a connection.'),
+	('wait_seconds_max', 'fyyur_db_pool_wait_seconds_max', 'gauge', 'Longest wait for a connection.'),
+	('timeouts', 'fyyur_db_pool_timeouts_total', 'counter', 'Checkouts that gave up after pool_timeout.'),
+)
+
+def render_metrics(stale_seconds=60):
+	snapshots = metrics.snapshots()
+	requests = Counter()
+	latency = {}
+	caches = {}
+	for snapshot in snapshots:
+		for endpoint, method, status, count in snapshot['requests']:
+			requests[(endpoint, method, status)] += count
+		for endpoint, histogram in snapshot['latency'].items():
+			total = latency.setdefault(endpoint, [0] * len(histogram))
+			for i, value in enumerate(histogram):
+				total[i] += value
+		for name, stats in snapshot['caches'].items():
+			total = caches.setdefault(name, Counter())
+			total['hits'] += stats['hits']
+			total['misses'] += stats['misses']
+
+	lines = []
+	family(lines, 'fyyur_requests_total', 'counter', 'Requests handled, by endpoint, method and status.', [
+		sample('fyyur_requests_total', {'endpoint': endpoint, 'method': method, 'status': status}, count)
+		for (endpoint, method, status), count in sorted(requests.items())
+	])
+	errors = Counter()
+	for (endpoint, method, status), count in requests.items():
+		if status >= 500:
+			errors[endpoint] += count
+	family(lines, 'fyyur_request_errors_total', 'counter', 'Requests that ended in a 5xx response, by endpoint.', [
+		sample('fyyur_request_errors_total', {'endpoint': endpoint}, count) for endpoint, count in sorted(errors.items())
+	])
+
+	histograms = []
+	for endpoint, histogram in sorted(latency.items()):
+		cumulative = 0
+		for bound, count in zip(BUCKETS + ('+Inf',), histogram[:-1]):
+			cumulative += count
+			histograms.append(sample('fyyur_request_duration_seconds_bucket', {'endpoint': endpoint, 'le': bound}, cumulative))
+		histograms.append(sample('fyyur_request_duration_seconds_sum', {'endpoint': endpoint}, histogram[-1]))
+		histograms.append(sample('fyyur_request_duration_seconds_count', {'endpoint': endpoint}, cumulative))
+	family(lines, 'fyyur_request_duration_seconds', 'histogram', 'Request latency, by endpoint.', histograms)
+
+	for kind in ('hits', 'misses'):
+		family(lines, 'fyyur_cache_%s_total' % kind, 'counter', 'Cache %s, by cache.' % kind, [
+			sample('fyyur_cache_%s_total' % kind, {'cache': name}, totals[kind]) for name, totals in sorted(caches.items())
+		])
+	family(lines, 'fyyur_cache_hit_ratio', 'gauge', 'Hits over lookups since the workers started, by cache.', [
+		sample('fyyur_cache_hit_ratio', {'cache': name}, float(totals['hits']) / (totals['hits'] + totals['misses']) if totals['hits'] + totals['misses'] else 0.0)
+		for name, totals in sorted(caches.items())
+	])
+
+	now = time.time()
+	pools = [
+		(snapshot['pid'], pool, stats)
+		for snapshot in snapshots if now - snapshot['time'] <= stale_seconds
+		for pool, stats in sorted(snapshot['pools'].items())
+	]
+	for field, name, kind, description in POOL_METRICS:
+		samples = [sample(name, {'pool': pool, 'pid': pid}, stats[field]) for pid, pool, stats in pools if field in stats]
+		if samples:
+			family(lines, name, kind, description, samples)
+	return '\n'.join(lines) + '\n'
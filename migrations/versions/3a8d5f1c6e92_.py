@@ -0,0 +1,28 @@
+"""btree indexes for searches shorter than a trigram
+
+Revision ID: 3a8d5f1c6e92
+Revises: e4a7c2d9f613
+Create Date: 2026-10-19 14:05:37.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8d5f1c6e92'
+down_revision = 'e4a7c2d9f613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_name_prefix', 'Venue', [sa.text('lower(name) text_pattern_ops')], unique=False)
+    op.create_index('ix_Artist_name_prefix', 'Artist', [sa.text('lower(name) text_pattern_ops')], unique=False)
+    op.create_index('ix_City_state_lower', 'City', [sa.text('lower(state)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_City_state_lower', table_name='City')
+    op.drop_index('ix_Artist_name_prefix', table_name='Artist')
+    op.drop_index('ix_Venue_name_prefix', table_name='Venue')
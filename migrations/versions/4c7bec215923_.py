@@ -0,0 +1,28 @@
+"""updated_at on venues, artists and shows
+
+Revision ID: 4c7bec215923
+Revises: bec3f7c6eced
+Create Date: 2026-10-18 12:03:51.774090
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c7bec215923'
+down_revision = 'bec3f7c6eced'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text("(now() at time zone 'utc')"), nullable=False))
+        op.create_index(op.f('ix_{0}_updated_at'.format(table)), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_index(op.f('ix_{0}_updated_at'.format(table)), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,46 @@
+"""show end_time and no overlapping bookings
+
+Revision ID: 5e1d9a3c7b28
+Revises: 4c7bec215923
+Create Date: 2026-10-18 14:22:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1d9a3c7b28'
+down_revision = '4c7bec215923'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # Existing shows get the default two hours, cut short where the venue or
+    # the artist has a later show starting sooner than that. Shows sharing a
+    # venue or artist and the exact same start_time cannot be fixed this way
+    # and make the constraints below fail; resolve those by hand first.
+    op.execute('''
+        UPDATE "Show" s SET end_time = least(
+            s.start_time + interval '2 hours',
+            coalesce((SELECT min(o.start_time) FROM "Show" o WHERE o.venue_id = s.venue_id AND o.start_time > s.start_time), 'infinity'),
+            coalesce((SELECT min(o.start_time) FROM "Show" o WHERE o.artist_id = s.artist_id AND o.start_time > s.start_time), 'infinity')
+        )
+    ''')
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.create_check_constraint('ck_Show_end_time', 'Show', 'end_time > start_time')
+    for key in ('venue_id', 'artist_id'):
+        op.execute('''
+            ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{0}_during"
+            EXCLUDE USING gist ({0} WITH =, tsrange(start_time, end_time) WITH &&)
+        '''.format(key))
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_artist_id_during', 'Show')
+    op.drop_constraint('ex_Show_venue_id_during', 'Show')
+    op.drop_constraint('ck_Show_end_time', 'Show')
+    op.drop_column('Show', 'end_time')
@@ -0,0 +1,41 @@
+"""delete a venue's or artist's dependent rows with it
+
+Revision ID: 7c3e1f9a2b84
+Revises: 9b4f2e6d1a57
+Create Date: 2026-10-18 18:12:40.251937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e1f9a2b84'
+down_revision = '9b4f2e6d1a57'
+branch_labels = None
+depends_on = None
+
+# The constraints were created unnamed, so they carry Postgres' default
+# <table>_<column>_fkey names.
+FOREIGN_KEYS = (
+    ('Venue_genre', 'venue_id', 'Venue'),
+    ('Artist_genre', 'artist_id', 'Artist'),
+    ('Show', 'venue_id', 'Venue'),
+    ('Show', 'artist_id', 'Artist'),
+    ('Venue_show_summary', 'venue_id', 'Venue'),
+    ('Artist_show_summary', 'artist_id', 'Artist'),
+)
+
+
+def upgrade():
+    for table, column, parent in FOREIGN_KEYS:
+        name = '{0}_{1}_fkey'.format(table, column)
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, parent, [column], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    for table, column, parent in FOREIGN_KEYS:
+        name = '{0}_{1}_fkey'.format(table, column)
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, parent, [column], ['id'])
@@ -0,0 +1,45 @@
+"""venue and artist show summaries
+
+Revision ID: 9b4f2e6d1a57
+Revises: 5e1d9a3c7b28
+Create Date: 2026-10-18 15:47:31.602915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4f2e6d1a57'
+down_revision = '5e1d9a3c7b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, key, parent in (('Venue_show_summary', 'venue_id', 'Venue'), ('Artist_show_summary', 'artist_id', 'Artist')):
+        op.create_table(table,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column('upcoming_shows', sa.Integer(), server_default='0', nullable=False),
+            sa.Column('past_shows', sa.Integer(), server_default='0', nullable=False),
+            sa.Column('next_show_time', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint([key], ['{0}.id'.format(parent)], ),
+            sa.PrimaryKeyConstraint(key)
+        )
+        op.create_index(op.f('ix_{0}_next_show_time'.format(table)), table, ['next_show_time'], unique=False)
+        # Show times are naive local times, compared against the server's
+        # local clock like datetime.now() in the app.
+        op.execute('''
+            INSERT INTO "{0}" ({1}, upcoming_shows, past_shows, next_show_time)
+            SELECT {1},
+                count(*) FILTER (WHERE start_time >= localtimestamp),
+                count(*) FILTER (WHERE start_time < localtimestamp),
+                min(start_time) FILTER (WHERE start_time >= localtimestamp)
+            FROM "Show" GROUP BY {1}
+        '''.format(table, key))
+
+
+def downgrade():
+    for table in ('Artist_show_summary', 'Venue_show_summary'):
+        op.drop_index(op.f('ix_{0}_next_show_time'.format(table)), table_name=table)
+        op.drop_table(table)
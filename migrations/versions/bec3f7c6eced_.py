@@ -0,0 +1,73 @@
+"""show, city and genre indexes; unique genre and city names
+
+Revision ID: bec3f7c6eced
+Revises: 21de79ca6a0f
+Create Date: 2026-10-18 10:41:27.508319
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bec3f7c6eced'
+down_revision = '21de79ca6a0f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Fold duplicate genres and cities onto their lowest id so the unique
+    # constraints below can be created on an existing database.
+    op.execute('''
+        CREATE TEMPORARY TABLE genre_duplicates ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, min(id) OVER (PARTITION BY name) AS keep_id FROM "Genre"
+        ) AS genres WHERE id <> keep_id
+    ''')
+    for table, key in (('Venue_genre', 'venue_id'), ('Artist_genre', 'artist_id')):
+        op.execute('''
+            INSERT INTO "{0}" ({1}, genre_id)
+            SELECT t.{1}, d.keep_id FROM "{0}" t JOIN genre_duplicates d ON t.genre_id = d.id
+            ON CONFLICT DO NOTHING
+        '''.format(table, key))
+        op.execute('DELETE FROM "{0}" WHERE genre_id IN (SELECT id FROM genre_duplicates)'.format(table))
+    op.execute('DELETE FROM "Genre" WHERE id IN (SELECT id FROM genre_duplicates)')
+
+    op.execute('''
+        CREATE TEMPORARY TABLE city_duplicates ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, min(id) OVER (PARTITION BY name, state) AS keep_id FROM "City"
+        ) AS cities WHERE id <> keep_id
+    ''')
+    for table in ('Venue', 'Artist'):
+        op.execute('''
+            UPDATE "{0}" t SET city_id = d.keep_id FROM city_duplicates d WHERE t.city_id = d.id
+        '''.format(table))
+    op.execute('DELETE FROM "City" WHERE id IN (SELECT id FROM city_duplicates)')
+
+    op.create_unique_constraint('uq_Genre_name', 'Genre', ['name'])
+    op.create_unique_constraint('uq_City_name_state', 'City', ['name', 'state'])
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_Venue_city_id_id', 'Venue', ['city_id', 'id'], unique=False)
+    op.create_index('ix_Artist_city_id', 'Artist', ['city_id'], unique=False)
+    op.create_index(op.f('ix_Venue_genre_genre_id'), 'Venue_genre', ['genre_id'], unique=False)
+    op.create_index(op.f('ix_Artist_genre_genre_id'), 'Artist_genre', ['genre_id'], unique=False)
+    op.create_index('ix_City_state_trgm', 'City', ['state'], unique=False, postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'})
+    op.create_index('ix_Genre_name_trgm', 'Genre', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Genre_name_trgm', table_name='Genre')
+    op.drop_index('ix_City_state_trgm', table_name='City')
+    op.drop_index(op.f('ix_Artist_genre_genre_id'), table_name='Artist_genre')
+    op.drop_index(op.f('ix_Venue_genre_genre_id'), table_name='Venue_genre')
+    op.drop_index('ix_Artist_city_id', table_name='Artist')
+    op.drop_index('ix_Venue_city_id_id', table_name='Venue')
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_constraint('uq_City_name_state', 'City', type_='unique')
+    op.drop_constraint('uq_Genre_name', 'Genre', type_='unique')
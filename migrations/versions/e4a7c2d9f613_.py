@@ -0,0 +1,28 @@
+"""count deletions per table for the listing versions
+
+Revision ID: e4a7c2d9f613
+Revises: 7c3e1f9a2b84
+Create Date: 2026-10-19 09:41:12.530218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c2d9f613'
+down_revision = '7c3e1f9a2b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Deletion_counter',
+        sa.Column('table_name', sa.String(length=64), nullable=False),
+        sa.Column('deletions', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('Deletion_counter')
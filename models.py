@@ -1,23 +1,30 @@
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 
-db = SQLAlchemy()
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
 Venue_genre = db.Table('Venue_genre',
-	db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
-	db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True)
+	db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+	db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True, index=True)
 )
 
 Artist_genre = db.Table('Artist_genre',
-	db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
-	db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True)
+	db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+	db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True, index=True)
 )
 
 class Venue(db.Model):
 	__tablename__ = 'Venue'
+	__table_args__ = (
+		db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+		db.Index('ix_Venue_city_id_id', 'city_id', 'id'),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String, nullable=False)
@@ -31,9 +38,14 @@ class Venue(db.Model):
 	seeking_talent = db.Column(db.Boolean, nullable=False)
 	seeking_description = db.Column(db.String)
 	shows = db.relationship('Show', backref='venue')
+	updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.text("(now() at time zone 'utc')"))
 
 class Artist(db.Model):
 	__tablename__ = 'Artist'
+	__table_args__ = (
+		db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+		db.Index('ix_Artist_city_id', 'city_id'),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String, nullable=False)
@@ -46,9 +58,15 @@ class Artist(db.Model):
 	seeking_venue = db.Column(db.Boolean, nullable=False)
 	seeking_description = db.Column(db.String)
 	shows = db.relationship('Show', backref='artist')
+	updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.text("(now() at time zone 'utc')"))
 
 class City(db.Model):
 	__tablename__ = 'City'
+	__table_args__ = (
+		db.Index('ix_City_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+		db.Index('ix_City_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+		db.UniqueConstraint('name', 'state', name='uq_City_name_state'),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String(120), nullable=False)
@@ -56,16 +74,65 @@ class City(db.Model):
 	artists = db.relationship('Artist', backref='city')
 	venues = db.relationship('Venue', backref='city')
 
+# Searches shorter than trigrams match name prefixes and exact state codes
+# ("CA"), case-insensitively, through these btree indexes.
+db.Index('ix_Venue_name_prefix', db.func.lower(Venue.name).label('name_lower'), postgresql_ops={'name_lower': 'text_pattern_ops'})
+db.Index('ix_Artist_name_prefix', db.func.lower(Artist.name).label('name_lower'), postgresql_ops={'name_lower': 'text_pattern_ops'})
+db.Index('ix_City_state_lower', db.func.lower(City.state))
+
 class Genre(db.Model):
 	__tablename__ = 'Genre'
+	__table_args__ = (
+		db.UniqueConstraint('name', name='uq_Genre_name'),
+		db.Index('ix_Genre_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String(120), nullable=False)
 
 class Show(db.Model):
 	__tablename__ = 'Show'
+	__table_args__ = (
+		db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+		db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+		db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+		db.CheckConstraint('end_time > start_time', name='ck_Show_end_time'),
+		# No venue or artist can be booked for two overlapping shows. The GiST
+		# indexes behind these also serve availability lookups. start_time is
+		# a timestamp without time zone, hence tsrange.
+		ExcludeConstraint(('venue_id', '='), (db.func.tsrange(db.column('start_time'), db.column('end_time')), '&&'), name='ex_Show_venue_id_during', using='gist'),
+		ExcludeConstraint(('artist_id', '='), (db.func.tsrange(db.column('start_time'), db.column('end_time')), '&&'), name='ex_Show_artist_id_during', using='gist'),
+	)
 
 	id = db.Column(db.Integer, primary_key=True)
 	start_time = db.Column(db.DateTime(), nullable=False)
-	venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-	artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
\ No newline at end of file
+	end_time = db.Column(db.DateTime(), nullable=False)
+	venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+	artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
+	updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=db.text("(now() at time zone 'utc')"))
+
+# Per venue and per artist show counters, kept up to date by summaries.py as
+# shows are added and removed. Counts are split at the last roll-forward:
+# once next_show_time has passed, the row needs rolling before its split is
+# current again.
+Venue_show_summary = db.Table('Venue_show_summary',
+	db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+	db.Column('upcoming_shows', db.Integer, nullable=False, server_default='0'),
+	db.Column('past_shows', db.Integer, nullable=False, server_default='0'),
+	db.Column('next_show_time', db.DateTime, index=True)
+)
+
+Artist_show_summary = db.Table('Artist_show_summary',
+	db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+	db.Column('upcoming_shows', db.Integer, nullable=False, server_default='0'),
+	db.Column('past_shows', db.Integer, nullable=False, server_default='0'),
+	db.Column('next_show_time', db.DateTime, index=True)
+)
+
+# Delete statements run per table. Listing versions (see app.py) read it to
+# notice deletions, which a row count would also show but only by scanning
+# the table on every request.
+Deletion_counter = db.Table('Deletion_counter',
+	db.Column('table_name', db.String(64), primary_key=True),
+	db.Column('deletions', db.BigInteger, nullable=False, server_default='0')
+)
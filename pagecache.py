@@ -0,0 +1,144 @@
+import time
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from flask import g, session
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class NullBackend(object):
+	def get(self, key):
+		return None
+
+	def set(self, key, value, ttl):
+		pass
+
+	def delete(self, *keys):
+		pass
+
+# Bounded LRU with per-entry expiry. Only suitable for a single process: an
+# invalidation in one worker does not reach the others.
+class MemoryBackend(object):
+	def __init__(self, max_entries=1024):
+		self.max_entries = max_entries
+		self.entries = OrderedDict()
+		self.lock = Lock()
+
+	def get(self, key):
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				return None
+			value, expires = entry
+			if expires <= time.monotonic():
+				del self.entries[key]
+				return None
+			self.entries.move_to_end(key)
+			return value
+
+	def set(self, key, value, ttl):
+		with self.lock:
+			self.entries[key] = (value, time.monotonic() + ttl)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.max_entries:
+				self.entries.popitem(last=False)
+
+	def delete(self, *keys):
+		with self.lock:
+			for key in keys:
+				self.entries.pop(key, None)
+
+# Any client with the redis-py get/set(ex=)/delete interface works, which
+# lets an in-process fake stand in for a server.
+class RedisBackend(object):
+	def __init__(self, client, prefix='fyyur:page:'):
+		self.client = client
+		self.prefix = prefix
+
+	def get(self, key):
+		value = self.client.get(self.prefix + key)
+		return value.decode('utf-8') if isinstance(value, bytes) else value
+
+	def set(self, key, value, ttl):
+		self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+	def delete(self, *keys):
+		if keys:
+			self.client.delete(*[self.prefix + key for key in keys])
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+class PageCache(object):
+	def __init__(self):
+		self.backend = NullBackend()
+		self.ttl = 300
+		self.hits = 0
+		self.misses = 0
+
+	def init_app(self, app):
+		self.ttl = app.config['PAGE_CACHE_TTL']
+		kind = app.config['PAGE_CACHE_BACKEND']
+		if kind == 'memory':
+			self.backend = MemoryBackend(app.config['PAGE_CACHE_MAX_ENTRIES'])
+		elif kind == 'redis':
+			import redis
+			self.backend = RedisBackend(redis.Redis.from_url(app.config['PAGE_CACHE_REDIS_URL']))
+		elif kind == 'null':
+			self.backend = NullBackend()
+		else:
+			raise ValueError('Unknown PAGE_CACHE_BACKEND %r' % kind)
+
+	def get(self, key):
+		value = self.backend.get(key)
+		if value is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return value
+
+	# `expires_in` caps the entry's lifetime below the configured TTL, e.g. at
+	# the moment an upcoming show becomes a past one. `ttl` replaces the
+	# configured TTL for entries keyed by version, which cannot go stale.
+	def set(self, key, value, expires_in=None, ttl=None):
+		ttl = self.ttl if ttl is None else ttl
+		if expires_in is not None:
+			ttl = min(ttl, expires_in)
+		if ttl > 0:
+			self.backend.set(key, value, ttl)
+
+	def invalidate(self, *keys):
+		self.backend.delete(*keys)
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'hit_ratio': float(self.hits) / lookups if lookups else 0.0,
+		}
+
+page_cache = PageCache()
+
+# Serve a view from the page cache under `key_format % view_args`. The view
+# may set g.page_expires_in to shorten the entry's lifetime. Requests with
+# pending flash messages bypass the cache, since those are rendered into the
+# page.
+def cached_page(key_format):
+	def decorator(f):
+		@wraps(f)
+		def wrapper(**kwargs):
+			if '_flashes' in session:
+				return f(**kwargs)
+			key = key_format % kwargs
+			page = page_cache.get(key)
+			if page is None:
+				g.page_expires_in = None
+				page = f(**kwargs)
+				page_cache.set(key, page, g.page_expires_in)
+			return page
+		return wrapper
+	return decorator
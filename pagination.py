@@ -0,0 +1,95 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import abort, current_app, request, url_for
+from sqlalchemy import tuple_
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# Pages are addressed by the sort key of their first/last row instead of an
+# OFFSET, so fetching page 1000 costs the same index range scan as page 1.
+
+def encode_cursor(values):
+	values = [x.isoformat() if isinstance(x, datetime) else x for x in values]
+	raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+	return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, columns):
+	try:
+		raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+		values = json.loads(raw)
+		if len(values) != len(columns):
+			raise ValueError(cursor)
+		return [
+			datetime.fromisoformat(value) if column.type.python_type is datetime else column.type.python_type(value)
+			for column, value in zip(columns, values)
+		]
+	except (binascii.Error, ValueError, TypeError):
+		abort(400)
+
+def page_size():
+	limit = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+	return max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+
+class Page(object):
+	def __init__(self, items, next_cursor=None, prev_cursor=None):
+		self.items = items
+		self.next_cursor = next_cursor
+		self.prev_cursor = prev_cursor
+
+	def __iter__(self):
+		return iter(self.items)
+
+	def _url(self, **cursor):
+		args = request.args.to_dict()
+		args.pop('after', None)
+		args.pop('before', None)
+		args.update(request.view_args or {})
+		args.update(cursor)
+		return url_for(request.endpoint, **args)
+
+	@property
+	def next_url(self):
+		return self._url(after=self.next_cursor) if self.next_cursor else None
+
+	@property
+	def prev_url(self):
+		return self._url(before=self.prev_cursor) if self.prev_cursor else None
+
+# Page `query` on the unique sort key `columns` using the `after`/`before`
+# cursors of the current request. `key` extracts the sort key from a row and
+# defaults to reading each column's attribute name.
+def paginate(query, columns, key=None):
+	if key is None:
+		key = lambda row: [getattr(row, column.key) for column in columns]
+	limit = page_size()
+	after = request.args.get('after')
+	before = request.args.get('before')
+
+	if before:
+		values = decode_cursor(before, columns)
+		rows = query.filter(tuple_(*columns) < tuple_(*values)) \
+			.order_by(*[column.desc() for column in columns]) \
+			.limit(limit + 1).all()
+		has_prev = len(rows) > limit
+		rows = rows[:limit][::-1]
+		has_next = True
+	else:
+		if after:
+			values = decode_cursor(after, columns)
+			query = query.filter(tuple_(*columns) > tuple_(*values))
+		rows = query.order_by(*columns).limit(limit + 1).all()
+		has_next = len(rows) > limit
+		rows = rows[:limit]
+		has_prev = after is not None
+
+	if not rows:
+		return Page(rows)
+	return Page(
+		rows,
+		next_cursor=encode_cursor(key(rows[-1])) if has_next else None,
+		prev_cursor=encode_cursor(key(rows[0])) if has_prev else None,
+	)
@@ -0,0 +1,269 @@
+from collections import Counter
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func, or_, and_, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+
+from forms import SHOW_MINUTES
+
+from models import Venue, Artist, City, Genre, Show, Venue_genre, Artist_genre, Deletion_counter, db
+from refdata import db_add_genre, db_add_city
+from summaries import db_count_shows
+
+#----------------------------------------------------------------------------#
+# Queries shared by the HTML views and the JSON API.
+#----------------------------------------------------------------------------#
+
+# Replace the genres of a venue or artist with set-based statements on the
+# association table, without loading the relationship.
+def db_set_genres(genre_table, genre_key, entity_id, genre_ids):
+	db.session.execute(genre_table.delete().where(genre_key == entity_id))
+	if genre_ids:
+		db.session.execute(genre_table.insert(), [
+			{genre_key.key: entity_id, 'genre_id': genre_id} for genre_id in genre_ids
+		])
+
+# Escape LIKE wildcards using Postgres' default escape character.
+def like_escape(term):
+	return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def like_pattern(term):
+	return '%' + like_escape(term) + '%'
+
+def prefix_pattern(term):
+	return like_escape(term) + '%'
+
+# Case-insensitive partial match on name, city, state ("San Francisco, CA"
+# included) and genre, ranked by trigram similarity. Each kind of match is a
+# separate index-driven id lookup (pg_trgm GIN indexes on the names, the
+# city_id and genre_id indexes for the joins). Terms shorter than
+# SEARCH_MIN_LENGTH, which the trigram indexes cannot serve, match name
+# prefixes ("U2") and state codes ("CA") exactly, on btree indexes instead.
+# Only the first SEARCH_COUNT_LIMIT matches are ranked and counted, so a
+# broad term costs no more than a narrow one; `more` is set when there may
+# be others. Name matches come first, most similar first, then city and
+# genre matches, so a broad term cannot crowd out an exact name.
+def db_search(model, genre_table, genre_key, search_term):
+	search_term = search_term.strip()
+	if not search_term:
+		return {'count': 0, 'more': False, 'data': []}
+	if len(search_term) < current_app.config['SEARCH_MIN_LENGTH']:
+		matches = [
+			select(model.id.label('id')).where(func.lower(model.name).like(prefix_pattern(search_term.lower()))),
+			select(model.id.label('id')).join(City, model.city_id == City.id).where(func.lower(City.state) == search_term.lower()),
+		]
+	else:
+		pattern = like_pattern(search_term)
+		city_conditions = [
+			City.name.ilike(pattern),
+			City.state.ilike(pattern),
+		]
+		if ',' in search_term:
+			city_name, state = [x.strip() for x in search_term.rsplit(',', 1)]
+			city_conditions.append(and_(
+				City.name.ilike(like_pattern(city_name)),
+				City.state.ilike(like_pattern(state)),
+			))
+		matches = [
+			select(model.id.label('id')).where(model.name.ilike(pattern)),
+			select(model.id.label('id')).join(City, model.city_id == City.id).where(or_(*city_conditions)),
+			select(genre_key.label('id')).join(Genre, Genre.id == genre_table.c.genre_id).where(Genre.name.ilike(pattern)),
+		]
+	count_limit = current_app.config['SEARCH_COUNT_LIMIT']
+	matches[0] = matches[0].order_by(func.similarity(model.name, search_term).desc(), model.id)
+	kinds = [match.limit(count_limit).subquery() for match in matches]
+	candidates = union_all(*[
+		select(kind.c.id, literal(order).label('kind')) for order, kind in enumerate(kinds)
+	]).order_by('kind').limit(count_limit).cte('candidates')
+	rank = func.greatest(
+		func.similarity(model.name, search_term),
+		func.similarity(City.name, search_term),
+	)
+	rows = db.session.query(
+		model.id,
+		model.name,
+		func.count().over().label('total'),
+		select(func.count()).select_from(candidates).scalar_subquery().label('candidates'),
+	).join(City, model.city_id == City.id) \
+		.filter(model.id.in_(select(candidates.c.id))) \
+		.order_by(rank.desc(), model.name, model.id) \
+		.limit(current_app.config['SEARCH_LIMIT']).all()
+	return {
+		'count': rows[0].total if rows else 0,
+		'more': bool(rows) and rows[0].candidates >= count_limit,
+		'data': [{
+			'id': row.id,
+			'name': row.name,
+		} for row in rows]
+	}
+
+# Column values for a venue or artist from validated VenueForm/ArtistForm
+# data, shared by the single-row creates below and the bulk importer.
+
+def venue_values(data, city_id):
+	return {
+		'name': data['name'],
+		'address': data['address'],
+		'phone': data['phone'],
+		'city_id': city_id,
+		'image_link': data['image_link'],
+		'facebook_link': data['facebook_link'],
+		'website': data['website_link'],
+		'seeking_talent': bool(data['seeking_talent']),
+		'seeking_description': data['seeking_description'],
+	}
+
+def artist_values(data, city_id):
+	return {
+		'name': data['name'],
+		'phone': data['phone'],
+		'city_id': city_id,
+		'image_link': data['image_link'],
+		'facebook_link': data['facebook_link'],
+		'website': data['website_link'],
+		'seeking_venue': bool(data['seeking_venue']),
+		'seeking_description': data['seeking_description'],
+	}
+
+# Create a venue, artist or show from validated form data and flush it so
+# the caller gets its id; committing is left to the caller.
+
+def db_create_venue(data):
+	genre_ids = db_add_genre(data['genres'])
+	venue = Venue(**venue_values(data, db_add_city(data['city'], data['state'])))
+	db.session.add(venue)
+	db.session.flush()
+	db_set_genres(Venue_genre, Venue_genre.c.venue_id, venue.id, genre_ids)
+	return venue
+
+def db_create_artist(data):
+	genre_ids = db_add_genre(data['genres'])
+	artist = Artist(**artist_values(data, db_add_city(data['city'], data['state'])))
+	db.session.add(artist)
+	db.session.flush()
+	db_set_genres(Artist_genre, Artist_genre.c.artist_id, artist.id, genre_ids)
+	return artist
+
+# Column values for a show from validated ShowForm data.
+def show_values(data):
+	return {
+		'artist_id': int(data['artist_id']),
+		'venue_id': int(data['venue_id']),
+		'start_time': data['start_time'],
+		'end_time': data['start_time'] + timedelta(minutes=data.get('duration') or SHOW_MINUTES),
+	}
+
+def db_create_show(data):
+	values = show_values(data)
+	show = Show(**values)
+	db.session.add(show)
+	db.session.flush()
+	db_count_shows([values])
+	return show
+
+# One row per occurrence of the data's recurrence rule, or just the one show.
+# The occurrences come expanded from ShowForm validation.
+def show_series(data):
+	values = show_values(data)
+	if data.get('occurrences') is None:
+		return [values]
+	length = values['end_time'] - values['start_time']
+	return [dict(values, start_time=start, end_time=start + length) for start in data['occurrences']]
+
+# The venue and artist ids among `rows` that exist, one query each however
+# many rows there are.
+def db_existing_ids(rows):
+	venue_ids = set(db.session.execute(select(Venue.id).where(Venue.id.in_({row['venue_id'] for row in rows}))).scalars())
+	artist_ids = set(db.session.execute(select(Artist.id).where(Artist.id.in_({row['artist_id'] for row in rows}))).scalars())
+	return venue_ids, artist_ids
+
+# Insert show rows with checked ids as one multi-row INSERT that skips rows
+# violating the no-overlap constraints, against existing shows or earlier
+# rows of the same statement (a repeated row included). Returns the inserted
+# (id, venue_id, artist_id, start_time) rows and the positions in `rows` of
+# those left out as double bookings. Matching is by count per (venue_id,
+# artist_id, start_time), so of two identical rows the one left out is
+# reported too; it is the later one.
+def db_insert_shows(rows):
+	inserted = db.session.execute(
+		pg_insert(Show).values(rows).on_conflict_do_nothing()
+			.returning(Show.id, Show.venue_id, Show.artist_id, Show.start_time)
+	).all()
+	db_count_shows([show._asdict() for show in inserted])
+	booked = Counter((show.venue_id, show.artist_id, show.start_time) for show in inserted)
+	skipped = []
+	for position, row in enumerate(rows):
+		key = (row['venue_id'], row['artist_id'], row['start_time'])
+		if booked[key]:
+			booked[key] -= 1
+		else:
+			skipped.append(position)
+	return inserted, skipped
+
+def show_page_keys(shows):
+	return ['venue:%d' % x for x in {show.venue_id for show in shows}] + \
+		['artist:%d' % x for x in {show.artist_id for show in shows}]
+
+# Bump the deletion counters of `tables` (see Deletion_counter), creating
+# their rows on first use.
+def db_count_deletions(*tables):
+	statement = pg_insert(Deletion_counter).values([{'table_name': table.name, 'deletions': 1} for table in tables])
+	db.session.execute(statement.on_conflict_do_update(index_elements=['table_name'], set_={
+		'deletions': Deletion_counter.c.deletions + 1,
+	}))
+
+# Delete a venue or artist in two set-based statements: its shows, returned
+# so the other side's summaries can be recounted, then the row itself,
+# whose genre and summary rows go with it by ON DELETE CASCADE. Returns the
+# name and the cached page keys to invalidate once the caller commits, or
+# None if there is no such row.
+def db_delete(model, show_key, entity_id):
+	shows = db.session.execute(Show.__table__.delete().where(show_key == entity_id)
+		.returning(Show.venue_id, Show.artist_id, Show.start_time)).all()
+	row = db.session.execute(model.__table__.delete().where(model.id == entity_id).returning(model.name)).first()
+	if row is None:
+		return None
+	db_count_shows([show._asdict() for show in shows], removed=True)
+	db_count_deletions(model.__table__, *([Show.__table__] if shows else []))
+	page_keys = {'%s:%d' % (model.__tablename__.lower(), entity_id)}
+	page_keys.update('venue:%d' % show.venue_id for show in shows)
+	page_keys.update('artist:%d' % show.artist_id for show in shows)
+	return row.name, page_keys
+
+#----------------------------------------------------------------------------#
+# Bookings.
+#----------------------------------------------------------------------------#
+
+# True for the exclusion_violation raised when a show overlaps another one
+# at the same venue or with the same artist.
+def is_booking_conflict(error):
+	return isinstance(error, IntegrityError) and getattr(error.orig, 'pgcode', None) == '23P01'
+
+def booked_during(start, end):
+	return func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start, end))
+
+# Free stretches of at least `length` between `start` and `end` for the venue
+# or artist whose id `key` (Show.venue_id or Show.artist_id) matches. Booked
+# ranges come from the exclusion constraint's GiST index and never overlap,
+# so each gap runs from the end of one booking to the start of the next.
+def db_free_slots(key, entity_id, start, end, length):
+	busy = select(
+		func.greatest(Show.start_time, start).label('busy_from'),
+		func.least(Show.end_time, end).label('busy_to'),
+	).where(key == entity_id, booked_during(start, end)).cte('busy')
+	gaps = union_all(
+		select(
+			func.lag(busy.c.busy_to, 1, literal(start, Show.start_time.type)).over(order_by=busy.c.busy_from).label('free_from'),
+			busy.c.busy_from.label('free_to'),
+		),
+		select(
+			func.coalesce(func.max(busy.c.busy_to), literal(start, Show.start_time.type)),
+			literal(end, Show.start_time.type),
+		),
+	).subquery('gaps')
+	return db.session.execute(
+		select(gaps.c.free_from, gaps.c.free_to)
+			.where(gaps.c.free_to - gaps.c.free_from >= length)
+			.order_by(gaps.c.free_from)
+	).all()
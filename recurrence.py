@@ -0,0 +1,32 @@
+from datetime import timedelta
+from itertools import islice
+from dateutil.rrule import rrulestr
+
+#----------------------------------------------------------------------------#
+# Recurring shows.
+#----------------------------------------------------------------------------#
+
+# A recurrence is an RFC 5545 RRULE, e.g. FREQ=WEEKLY;COUNT=52 or
+# FREQ=WEEKLY;BYDAY=FR,SA;UNTIL=20271231T235959, anchored at the show's start
+# time; a start time the rule does not match is not itself an occurrence.
+# Shows repeat at most daily, and one rule yields at most MAX_OCCURRENCES.
+# Spacing is checked on the expanded start times rather than on FREQ, as
+# FREQ=DAILY;BYHOUR=18,21 repeats twice a day all the same.
+
+MAX_OCCURRENCES = 366
+MIN_SPACING = timedelta(days=1)
+
+# Start times of every occurrence; raises ValueError with a message fit for
+# the user.
+def occurrences(rule, start):
+	try:
+		starts = list(islice(rrulestr(rule, dtstart=start), MAX_OCCURRENCES + 1))
+	except (ValueError, TypeError) as e:
+		raise ValueError('Not a valid recurrence rule: %s' % e)
+	if not starts:
+		raise ValueError('The recurrence rule has no occurrences.')
+	if any(later - earlier < MIN_SPACING for earlier, later in zip(starts, starts[1:])):
+		raise ValueError('Shows can repeat at most daily.')
+	if len(starts) > MAX_OCCURRENCES:
+		raise ValueError('A recurrence can create at most %d shows; add a COUNT or an earlier UNTIL.' % MAX_OCCURRENCES)
+	return starts
@@ -0,0 +1,168 @@
+from threading import Lock
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from models import City, Genre, db
+from routing import RoutingSession
+
+#----------------------------------------------------------------------------#
+# Reference data cache.
+#----------------------------------------------------------------------------#
+
+# Genre and City are small lookup tables whose rows never change once
+# committed, so each process keeps name->id and id->(name, state) maps for
+# them. The maps are always loaded on a connection of their own, outside the
+# request transaction, so rows that might still be rolled back never end up
+# in the cache. Writers mark their session when they insert new rows, the
+# maps are dropped once that session commits, and the next lookup reloads
+# them. Dropping them any earlier would let a concurrent lookup reload a
+# snapshot without the new rows and keep it.
+
+class ReferenceCache(object):
+	def __init__(self):
+		self.lock = Lock()
+		self.hits = 0
+		self.misses = 0
+		self.genre_ids = None
+		self.city_ids = None
+		self.cities = None
+
+	# Returns the maps it loaded, which stay valid for the caller even if
+	# another thread invalidates the cache straight away.
+	def warm(self):
+		with db.engine.connect() as conn:
+			genres = conn.execute(select(Genre.name, Genre.id)).all()
+			cities = conn.execute(select(City.id, City.name, City.state)).all()
+		maps = {
+			'genre_ids': dict(genres),
+			'city_ids': {(city.name, city.state): city.id for city in cities},
+			'cities': {city.id: (city.name, city.state) for city in cities},
+		}
+		with self.lock:
+			self.genre_ids = maps['genre_ids']
+			self.city_ids = maps['city_ids']
+			self.cities = maps['cities']
+		return maps
+
+	def invalidate(self):
+		with self.lock:
+			self.genre_ids = None
+			self.city_ids = None
+			self.cities = None
+
+	def _lookup(self, attribute, key):
+		with self.lock:
+			table = getattr(self, attribute)
+		if table is None:
+			table = self.warm()[attribute]
+		value = table.get(key)
+		if value is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return value
+
+	def genre_id(self, name):
+		return self._lookup('genre_ids', name)
+
+	def city_id(self, name, state):
+		return self._lookup('city_ids', (name, state))
+
+	def city(self, city_id):
+		city = self._lookup('cities', city_id)
+		if city is None:
+			with db.engine.connect() as conn:
+				row = conn.execute(select(City.name, City.state).where(City.id == city_id)).first()
+			if row is not None:
+				city = tuple(row)
+				self.add_city(city_id, *city)
+		return city
+
+	def add_city(self, city_id, name, state):
+		with self.lock:
+			if self.cities is not None:
+				self.city_ids[(name, state)] = city_id
+				self.cities[city_id] = (name, state)
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'hit_ratio': float(self.hits) / lookups if lookups else 0.0,
+			'genres': len(self.genre_ids or ()),
+			'cities': len(self.cities or ()),
+		}
+
+reference_cache = ReferenceCache()
+
+@event.listens_for(RoutingSession, 'after_commit')
+def invalidate_on_commit(session):
+	if session.info.pop('reference_data', False):
+		reference_cache.invalidate()
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def forget_reference_data(session):
+	session.info.pop('reference_data', None)
+
+#----------------------------------------------------------------------------#
+# Upserts.
+#----------------------------------------------------------------------------#
+
+# Names missing from the cache are upserted with INSERT ... ON CONFLICT DO
+# NOTHING RETURNING inside a CTE. The CTE yields the newly inserted rows and
+# the outer SELECT the ones that already existed, so each call is a single
+# round-trip and concurrent submissions cannot create duplicates. A row
+# committed by a concurrent transaction after our snapshot shows up in
+# neither half; the rare fallback query picks it up. Any miss invalidates the
+# cache once the transaction commits, since the ids just resolved may belong
+# to rows that are not committed until then.
+
+def db_add_genre(new_genres):
+	names = list(dict.fromkeys(new_genres))
+	genre_ids = {}
+	for name in names:
+		genre_id = reference_cache.genre_id(name)
+		if genre_id is not None:
+			genre_ids[name] = genre_id
+	missing = [name for name in names if name not in genre_ids]
+	if not missing:
+		return [genre_ids[name] for name in names]
+
+	inserted = insert(Genre).values([{'name': name} for name in missing]) \
+		.on_conflict_do_nothing(index_elements=['name']) \
+		.returning(Genre.name, Genre.id).cte('inserted')
+	genre_ids.update(db.session.execute(
+		select(inserted.c.name, inserted.c.id).union_all(select(Genre.name, Genre.id).where(Genre.name.in_(missing)))
+	).all())
+	unresolved = [name for name in missing if name not in genre_ids]
+	if unresolved:
+		genre_ids.update(db.session.execute(select(Genre.name, Genre.id).where(Genre.name.in_(unresolved))).all())
+	db.session.info['reference_data'] = True
+	return [genre_ids[name] for name in names]
+
+def db_add_cities(new_cities):
+	new_cities = list(dict.fromkeys(new_cities))
+	city_ids = {}
+	for name, state in new_cities:
+		city_id = reference_cache.city_id(name, state)
+		if city_id is not None:
+			city_ids[(name, state)] = city_id
+	missing = [city for city in new_cities if city not in city_ids]
+	if not missing:
+		return city_ids
+
+	inserted = insert(City).values([{'name': name, 'state': state} for name, state in missing]) \
+		.on_conflict_do_nothing(index_elements=['name', 'state']) \
+		.returning(City.name, City.state, City.id).cte('inserted')
+	existing = lambda cities: select(City.name, City.state, City.id).where(tuple_(City.name, City.state).in_(cities))
+	rows = db.session.execute(select(inserted.c.name, inserted.c.state, inserted.c.id).union_all(existing(missing))).all()
+	city_ids.update(((name, state), city_id) for name, state, city_id in rows)
+	unresolved = [city for city in missing if city not in city_ids]
+	if unresolved:
+		city_ids.update(((name, state), city_id) for name, state, city_id in db.session.execute(existing(unresolved)))
+	db.session.info['reference_data'] = True
+	return city_ids
+
+def db_add_city(new_city, new_state):
+	return db_add_cities([(new_city, new_state)])[(new_city, new_state)]
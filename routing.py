@@ -0,0 +1,76 @@
+import time
+from functools import wraps
+from flask import current_app, has_request_context, session as flask_session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.sql.dml import UpdateBase
+from werkzeug.wrappers import Response
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#----------------------------------------------------------------------------#
+
+# With a 'replica' entry in SQLALCHEMY_BINDS, views marked @read_only run
+# their queries on the replica engine. Everything else, and any flush or
+# INSERT/UPDATE/DELETE even inside a read-only view, goes to the primary.
+# After a request commits a write, the user's (signed cookie) session keeps
+# them on the primary for READ_YOUR_WRITES_SECONDS, long enough for the
+# replica to catch up with what they just did.
+
+REPLICA = 'replica'
+
+class RoutingSession(SignallingSession):
+	def get_bind(self, mapper=None, clause=None, **kwargs):
+		if self.info.get(REPLICA) and not self._flushing and not isinstance(clause, UpdateBase):
+			return self.app.extensions['sqlalchemy'].db.get_engine(self.app, bind=REPLICA)
+		return SignallingSession.get_bind(self, mapper, clause)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+	def create_session(self, options):
+		return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def wrote_on_flush(session, flush_context):
+	session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def wrote_on_execute(state):
+	if state.is_insert or state.is_update or state.is_delete:
+		state.session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def pin_to_primary(session):
+	if session.info.pop('wrote', False) and has_request_context():
+		flask_session['primary_until'] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def forget_writes(session):
+	session.info.pop('wrote', None)
+
+# Keep reads on the replica while a streamed body is produced, which
+# happens after the view has returned. `yield from` passes close() on to
+# the body, so stream_with_context still tears the request down.
+def replica_stream(info, chunks):
+	info[REPLICA] = True
+	try:
+		yield from chunks
+	finally:
+		info.pop(REPLICA, None)
+
+# Outermost decorator on a view (under the route), so that version checks
+# and page cache fills read from the replica too, as do streamed responses.
+def read_only(f):
+	@wraps(f)
+	def wrapper(*args, **kwargs):
+		if REPLICA not in current_app.config['SQLALCHEMY_BINDS'] or flask_session.get('primary_until', 0) > time.time():
+			return f(*args, **kwargs)
+		info = current_app.extensions['sqlalchemy'].db.session.info
+		info[REPLICA] = True
+		try:
+			response = f(*args, **kwargs)
+		finally:
+			info.pop(REPLICA, None)
+		if isinstance(response, Response) and response.is_streamed:
+			response.response = replica_stream(info, response.response)
+		return response
+	return wrapper
@@ -2,3 +2,21 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Delete buttons on the venue and artist pages.
+document.addEventListener('click', function (e) {
+  var button = e.target.closest('[data-delete]');
+  if (!button || !window.confirm('Delete ' + button.getAttribute('data-name') + ' and all of its shows?')) {
+    return;
+  }
+  button.disabled = true;
+  fetch(button.getAttribute('data-delete'), { method: 'DELETE' }).then(function (response) {
+    if (!response.ok) {
+      throw new Error(response.statusText);
+    }
+    window.location = '/';
+  }).catch(function () {
+    button.disabled = false;
+    window.alert('Could not delete ' + button.getAttribute('data-name') + '.');
+  });
+});
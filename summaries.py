@@ -0,0 +1,80 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from models import Show, Venue_show_summary, Artist_show_summary, db
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+# Venue_show_summary and Artist_show_summary hold upcoming/past counts and the
+# next show time per venue and artist, so listings can show counts from a
+# join instead of counting shows per row. Adding shows adjusts the counters
+# in place and removing them recounts the affected rows, with one statement
+# per table either way; shows that have since started are moved from
+# upcoming to past by roll_show_summaries(), meant to run periodically
+# (`flask roll-show-summaries`).
+
+SUMMARIES = (
+	(Venue_show_summary, Venue_show_summary.c.venue_id, Show.venue_id),
+	(Artist_show_summary, Artist_show_summary.c.artist_id, Show.artist_id),
+)
+
+# The upcoming count of a venue or artist as of `now`: the stored count, or
+# an index range count for rows a show has started on since the last roll.
+def upcoming_shows(summary, key, show_key, now):
+	return case(
+		(summary.c.next_show_time < now, select(func.count(Show.id))
+			.where(show_key == key, Show.start_time >= now).scalar_subquery()),
+		else_=func.coalesce(summary.c.upcoming_shows, 0),
+	)
+
+# Set the counters of the rows matching `where` from the (venue_id|artist_id,
+# start_time) indexes, split at `now`. Rows without shows left drop to zero.
+def recount(summary, key, show_key, where, now):
+	shows = lambda *conditions: select(func.count(Show.id)).where(show_key == key, *conditions).scalar_subquery()
+	return db.session.execute(update(summary).where(where).values(
+		upcoming_shows=shows(Show.start_time >= now),
+		past_shows=shows(Show.start_time < now),
+		next_show_time=select(func.min(Show.start_time)).where(show_key == key, Show.start_time >= now).scalar_subquery(),
+	)).rowcount
+
+# `shows` are dicts with the venue_id, artist_id and start_time of shows just
+# inserted, or just deleted when `removed` is set, in the current transaction.
+# Inserts adjust the counters by their deltas; a stale row keeps its past
+# next_show_time and is recounted by the next roll. Deletes recount the
+# affected rows instead, as a delta cannot tell whether a removed show was
+# still counted as upcoming by a row that has not been rolled since it
+# started.
+def db_count_shows(shows, removed=False):
+	if not shows:
+		return
+	now = datetime.now()
+	for summary, key, show_key in SUMMARIES:
+		if removed:
+			recount(summary, key, show_key, key.in_({show[show_key.key] for show in shows}), now)
+			continue
+		deltas = defaultdict(lambda: {'upcoming_shows': 0, 'past_shows': 0, 'next_show_time': None})
+		for show in shows:
+			delta = deltas[show[show_key.key]]
+			start_time = show['start_time']
+			if start_time >= now:
+				delta['upcoming_shows'] += 1
+				if delta['next_show_time'] is None or start_time < delta['next_show_time']:
+					delta['next_show_time'] = start_time
+			else:
+				delta['past_shows'] += 1
+		statement = insert(summary).values([dict(delta, **{key.key: entity_id}) for entity_id, delta in deltas.items()])
+		db.session.execute(statement.on_conflict_do_update(index_elements=[key], set_={
+			'upcoming_shows': summary.c.upcoming_shows + statement.excluded.upcoming_shows,
+			'past_shows': summary.c.past_shows + statement.excluded.past_shows,
+			'next_show_time': func.least(summary.c.next_show_time, statement.excluded.next_show_time),
+		}))
+
+# Recount every row whose next show has started. Returns the number of rows
+# rolled forward.
+def roll_show_summaries(now=None):
+	now = now or datetime.now()
+	return sum(recount(summary, key, show_key, summary.c.next_show_time < now, now) for summary, key, show_key in SUMMARIES)
@@ -0,0 +1,178 @@
+import difflib
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import CheckConstraint, MetaData, event, text
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.sql.elements import TextClause
+
+# Logs off and no startup options SQLite would not understand; config.py
+# reads these when app.py is imported.
+os.environ.setdefault('REQUEST_LOG', '')
+os.environ.setdefault('SLOW_QUERY_LOG', '')
+os.environ.setdefault('DB_STATEMENT_TIMEOUT_MS', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as fyyur
+from forms import ShowForm, form_from_dict
+from models import Venue, Artist, City, Genre, Show, db
+from pagecache import page_cache, NullBackend
+from refdata import reference_cache
+
+#----------------------------------------------------------------------------#
+# Databases.
+#----------------------------------------------------------------------------#
+
+# Tests run on SQLite files by default. Exclusion and CHECK constraints and
+# Postgres server defaults are left out of the schema, and the few Postgres
+# functions the read queries use are defined on each connection. Tests of
+# Postgres-only statements (upserts, RETURNING, tsrange) are marked
+# `postgres` and run when TEST_DATABASE_URL points at a disposable database,
+# whose tables they drop afterwards.
+
+POSTGRES_URL = os.environ.get('TEST_DATABASE_URL')
+
+def pytest_configure(config):
+	config.addinivalue_line('markers', 'postgres: needs the Postgres database in TEST_DATABASE_URL')
+
+def sqlite_metadata():
+	metadata = MetaData()
+	for table in db.metadata.sorted_tables:
+		copy = table.to_metadata(metadata)
+		copy.constraints = {c for c in copy.constraints if not isinstance(c, (CheckConstraint, ExcludeConstraint))}
+		for column in copy.columns:
+			column.constraints = set()
+			if isinstance(getattr(column.server_default, 'arg', None), TextClause):
+				column.server_default = None
+	return metadata
+
+def sqlite_functions(conn, record):
+	conn.create_function('similarity', 2, lambda a, b: difflib.SequenceMatcher(None, a or '', b or '').ratio())
+	conn.create_function('greatest', -1, lambda *a: max((x for x in a if x is not None), default=None))
+	conn.create_function('least', -1, lambda *a: min((x for x in a if x is not None), default=None))
+
+def create_schema(engine):
+	if engine.dialect.name == 'sqlite':
+		event.listen(engine, 'connect', sqlite_functions)
+		sqlite_metadata().create_all(engine)
+	else:
+		with engine.begin() as conn:
+			conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+			conn.execute(text('CREATE EXTENSION IF NOT EXISTS btree_gist'))
+		db.metadata.create_all(engine)
+
+@pytest.fixture
+def database_url(request, tmp_path):
+	if request.node.get_closest_marker('postgres') is None:
+		return 'sqlite:///%s' % (tmp_path / 'primary.db')
+	if not POSTGRES_URL:
+		pytest.skip('needs TEST_DATABASE_URL')
+	return POSTGRES_URL
+
+# Extra SQLALCHEMY_BINDS, each given a schema of its own; see test_routing.py.
+@pytest.fixture
+def binds():
+	return {}
+
+# The app on a fresh database, inside an app context, with the page cache off
+# and the reference data cache empty.
+@pytest.fixture
+def app(database_url, binds, monkeypatch):
+	monkeypatch.setitem(fyyur.config, 'SQLALCHEMY_DATABASE_URI', database_url)
+	monkeypatch.setitem(fyyur.config, 'SQLALCHEMY_BINDS', binds)
+	monkeypatch.setitem(fyyur.config, 'WTF_CSRF_ENABLED', False)
+	monkeypatch.setitem(fyyur.config, 'TESTING', True)
+	monkeypatch.setattr(page_cache, 'backend', NullBackend())
+	reference_cache.invalidate()
+	with fyyur.app_context():
+		for bind in [None] + list(binds):
+			create_schema(db.get_engine(bind=bind))
+		yield fyyur
+		db.session.remove()
+		if database_url == POSTGRES_URL:
+			db.metadata.drop_all(db.engine)
+		for bind in [None] + list(binds):
+			db.get_engine(bind=bind).dispose()
+	reference_cache.invalidate()
+
+@pytest.fixture
+def client(app):
+	return app.test_client()
+
+# Statements run on `engine` (the primary by default) inside the block.
+@pytest.fixture
+def statements(app):
+	class Recorder(object):
+		def __init__(self, engine=None):
+			self.engine = engine or db.engine
+			self.statements = []
+
+		def record(self, conn, cursor, statement, parameters, context, executemany):
+			self.statements.append(statement)
+
+		def __enter__(self):
+			event.listen(self.engine, 'before_cursor_execute', self.record)
+			return self.statements
+
+		def __exit__(self, *exc_info):
+			event.remove(self.engine, 'before_cursor_execute', self.record)
+	return Recorder
+
+#----------------------------------------------------------------------------#
+# Records.
+#----------------------------------------------------------------------------#
+
+# Rows are committed and handed back detached, so they stay readable after
+# a view closes the session the tests share with it.
+
+def detached(row):
+	db.session.add(row)
+	db.session.commit()
+	db.session.refresh(row)
+	db.session.expunge(row)
+	return row
+
+class Records(object):
+	def __init__(self):
+		self.city = detached(City(name='San Francisco', state='CA'))
+		self.genre = detached(Genre(name='Jazz'))
+
+	def venue(self, name='The Musical Hop', **values):
+		genre = db.session.get(Genre, self.genre.id)
+		return detached(Venue(name=name, phone='123-123-1234', city_id=self.city.id, seeking_talent=False, genres=[genre], **values))
+
+	def artist(self, name='Guns N Petals', **values):
+		genre = db.session.get(Genre, self.genre.id)
+		return detached(Artist(name=name, phone='326-123-5000', city_id=self.city.id, seeking_venue=False, genres=[genre], **values))
+
+	# Fields of a valid venue edit form for a venue in the existing city and
+	# genre, which the edit views resolve without inserting anything.
+	def venue_form(self, name):
+		return {
+			'name': name,
+			'city': 'San Francisco',
+			'state': 'CA',
+			'address': '1015 Folsom Street',
+			'phone': '123-123-1234',
+			'genres': 'Jazz',
+			'image_link': '',
+			'facebook_link': '',
+			'website_link': '',
+			'seeking_description': '',
+		}
+
+	# A ShowForm for the given fields on top of a valid show at 2035-05-21
+	# 21:30. The ids need not exist; forms do not look them up.
+	def show_form(self, **values):
+		return form_from_dict(ShowForm, dict({'venue_id': 1, 'artist_id': 2, 'start_time': '2035-05-21 21:30:00'}, **values))
+
+	# Shows `days` from now, two hours long.
+	def show(self, venue, artist, days=1):
+		start_time = datetime.now().replace(microsecond=0) + timedelta(days=days)
+		return detached(Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time, end_time=start_time + timedelta(hours=2)))
+
+@pytest.fixture
+def records(app):
+	return Records()
@@ -0,0 +1,93 @@
+import pytest
+
+from models import Venue
+
+@pytest.fixture
+def venues(records):
+	return [records.venue('Venue %d' % n) for n in range(5)]
+
+#----------------------------------------------------------------------------#
+# Fields.
+#----------------------------------------------------------------------------#
+
+def test_default_fields(client, venues):
+	data = client.get('/api/v1/venues').get_json()['data']
+	assert data[0] == {'id': venues[0].id, 'name': 'Venue 0', 'city': 'San Francisco', 'state': 'CA'}
+
+def test_selected_fields(client, venues, statements):
+	with statements() as executed:
+		data = client.get('/api/v1/venues?fields=name, phone,name').get_json()['data']
+	assert data[0] == {'name': 'Venue 0', 'phone': '123-123-1234'}
+	# No join for fields that do not need the city.
+	assert not any('"City"' in statement for statement in executed)
+
+def test_unknown_fields(client, venues):
+	response = client.get('/api/v1/venues?fields=name,password')
+	assert response.status_code == 400
+	assert response.get_json()['description'] == 'Unknown fields: password'
+	assert client.get('/api/v1/venues/%d?fields=password' % venues[0].id).status_code == 400
+
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
+
+def test_cursor_pagination(client, venues):
+	first = client.get('/api/v1/venues?limit=2&fields=id,name').get_json()
+	assert [venue['name'] for venue in first['data']] == ['Venue 0', 'Venue 1']
+	assert first['prev'] is None
+	assert 'fields=id,name' in first['next'] and 'limit=2' in first['next']
+	second = client.get(first['next']).get_json()
+	assert [venue['name'] for venue in second['data']] == ['Venue 2', 'Venue 3']
+	assert set(second['data'][0]) == {'id', 'name'}
+	last = client.get(second['next']).get_json()
+	assert [venue['name'] for venue in last['data']] == ['Venue 4']
+	assert last['next'] is None
+	assert [venue['name'] for venue in client.get(last['prev']).get_json()['data']] == ['Venue 2', 'Venue 3']
+
+def test_bad_cursor(client, venues):
+	assert client.get('/api/v1/venues?after=not-a-cursor').status_code == 400
+
+#----------------------------------------------------------------------------#
+# Detail.
+#----------------------------------------------------------------------------#
+
+def test_detail(client, venues):
+	response = client.get('/api/v1/venues/%d?fields=name,seeking_talent' % venues[0].id)
+	assert response.get_json() == {'name': 'Venue 0', 'seeking_talent': False}
+
+@pytest.mark.parametrize('path', ['/api/v1/venues/999', '/api/v1/artists/999', '/api/v1/shows/999'])
+def test_detail_not_found(client, records, path):
+	response = client.get(path)
+	assert response.status_code == 404
+	assert response.get_json()['error'] == 'Not Found'
+
+@pytest.mark.postgres
+def test_genres_field(client, venues):
+	assert client.get('/api/v1/venues/%d?fields=genres' % venues[0].id).get_json() == {'genres': ['Jazz']}
+
+#----------------------------------------------------------------------------#
+# Create.
+#----------------------------------------------------------------------------#
+
+VENUE = {
+	'name': 'The Musical Hop',
+	'city': 'San Francisco',
+	'state': 'CA',
+	'address': '1015 Folsom Street',
+	'phone': '123-123-1234',
+	'genres': ['Jazz'],
+}
+
+def test_create_validation(client, records):
+	response = client.post('/api/v1/venues', json=dict(VENUE, phone='555', state='XX'))
+	assert response.status_code == 400
+	assert sorted(response.get_json()['errors']) == ['phone', 'state']
+	assert client.post('/api/v1/venues', json=['not', 'an', 'object']).status_code == 400
+	assert Venue.query.count() == 0
+
+def test_create(client, records):
+	response = client.post('/api/v1/venues', json=VENUE)
+	assert response.status_code == 201
+	venue_id = response.get_json()['id']
+	assert response.headers['Location'].endswith('/api/v1/venues/%d' % venue_id)
+	assert client.get(response.headers['Location']).get_json()['name'] == 'The Musical Hop'
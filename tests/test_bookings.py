@@ -0,0 +1,99 @@
+import types
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from queries import is_booking_conflict, show_values, db_free_slots
+from models import Show, db
+
+def integrity_error(pgcode):
+	return IntegrityError('INSERT INTO "Show" ...', {}, types.SimpleNamespace(pgcode=pgcode))
+
+def test_only_exclusion_violations_are_booking_conflicts():
+	assert is_booking_conflict(integrity_error('23P01'))
+	# unique_violation and foreign_key_violation.
+	assert not is_booking_conflict(integrity_error('23505'))
+	assert not is_booking_conflict(integrity_error('23503'))
+	assert not is_booking_conflict(ValueError('23P01'))
+
+#----------------------------------------------------------------------------#
+# Duration.
+#----------------------------------------------------------------------------#
+
+def test_end_time_follows_the_duration(records):
+	form = records.show_form(duration=90)
+	assert form.validate(), form.errors
+	assert show_values(form.data)['end_time'] == datetime(2035, 5, 21, 23, 0)
+
+def test_duration_defaults_to_two_hours(records):
+	form = records.show_form()
+	assert form.validate(), form.errors
+	assert show_values(form.data)['end_time'] == datetime(2035, 5, 21, 23, 30)
+
+@pytest.mark.parametrize('duration', [0, 24 * 60 + 1, 'long'])
+def test_duration_out_of_range(records, duration):
+	form = records.show_form(duration=duration)
+	assert not form.validate()
+	assert 'duration' in form.errors
+
+#----------------------------------------------------------------------------#
+# Availability.
+#----------------------------------------------------------------------------#
+
+@pytest.mark.parametrize('query', [
+	'from=tomorrow',
+	'duration=an-hour',
+	'from=2035-05-21T12:00&to=2035-05-21T10:00',
+	'from=2035-05-21T12:00&to=2037-05-21T12:00',
+	'duration=0',
+])
+def test_availability_rejects_bad_parameters(client, query):
+	response = client.get('/api/v1/venues/1/availability?' + query)
+	assert response.status_code == 400
+	assert response.get_json()['description']
+
+def test_availability_of_a_missing_venue(client, records):
+	assert client.get('/api/v1/venues/999/availability').status_code == 404
+	assert client.get('/api/v1/artists/999/availability').status_code == 404
+
+#----------------------------------------------------------------------------#
+# Overlaps.
+#----------------------------------------------------------------------------#
+
+def post_show(client, venue, artist, start_time, duration=120):
+	return client.post('/api/v1/shows', json={'venue_id': venue.id, 'artist_id': artist.id, 'start_time': start_time, 'duration': duration})
+
+@pytest.mark.postgres
+def test_overlapping_shows_are_rejected(client, records):
+	venue, artist = records.venue(), records.artist()
+	other_artist = records.artist('Matt Quevedo')
+	assert post_show(client, venue, artist, '2035-05-21 20:00:00').status_code == 201
+	response = post_show(client, venue, other_artist, '2035-05-21 21:30:00')
+	assert response.status_code == 409
+	assert response.get_json()['description'] == 'The venue or the artist already has a show at that time.'
+	# Back to back is fine.
+	assert post_show(client, venue, other_artist, '2035-05-21 22:00:00').status_code == 201
+	assert Show.query.count() == 2
+
+@pytest.mark.postgres
+def test_free_slots(app, records):
+	venue, artist = records.venue(), records.artist()
+	day = datetime(2035, 5, 21)
+	db.session.add_all([
+		Show(venue_id=venue.id, artist_id=artist.id, start_time=day + timedelta(hours=hour), end_time=day + timedelta(hours=hour + hours))
+		for hour, hours in ((12, 2), (15, 1), (19, 3))
+	])
+	db.session.commit()
+	slots = db_free_slots(Show.venue_id, venue.id, day + timedelta(hours=10), day + timedelta(hours=23), timedelta(hours=1))
+	assert [(slot.free_from.hour, slot.free_to.hour) for slot in slots] == [(10, 12), (14, 15), (16, 19), (22, 23)]
+
+@pytest.mark.postgres
+def test_repeated_batch_items_are_reported(client, records):
+	venue, artist = records.venue(), records.artist()
+	item = {'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-05-21 20:00:00'}
+	response = client.post('/api/v1/shows/batch', json={'shows': [item, dict(item, start_time='2035-05-22 20:00:00'), item]})
+	assert response.status_code == 201
+	body = response.get_json()
+	assert len(body['created']) == 2
+	assert [conflict['index'] for conflict in body['conflicts']] == [2]
@@ -0,0 +1,34 @@
+import pytest
+
+from models import Deletion_counter, db
+
+@pytest.fixture
+def venue(records):
+	return records.venue()
+
+@pytest.mark.parametrize('path', ['/venues', '/artists', '/shows'])
+def test_not_modified_without_counting_rows(client, venue, statements, path):
+	etag = client.get(path).headers['ETag']
+	with statements() as executed:
+		response = client.get(path, headers={'If-None-Match': etag})
+	assert response.status_code == 304
+	assert len(executed) == 1
+	assert 'count(' not in executed[0]
+
+def test_new_rows_change_the_etag(client, records, venue):
+	etag = client.get('/venues').headers['ETag']
+	records.venue('Park Square Live Music & Coffee')
+	assert client.get('/venues', headers={'If-None-Match': etag}).status_code == 200
+
+def test_deletions_change_the_etag(client, venue):
+	etag = client.get('/venues').headers['ETag']
+	db.session.execute(Deletion_counter.insert().values(table_name='Venue', deletions=1))
+	db.session.commit()
+	assert client.get('/venues', headers={'If-None-Match': etag}).status_code == 200
+
+@pytest.mark.postgres
+def test_deleting_a_venue_changes_the_etag(client, records, venue):
+	records.venue('Park Square Live Music & Coffee')
+	etag = client.get('/venues').headers['ETag']
+	assert client.delete('/venues/%d' % venue.id).status_code == 200
+	assert client.get('/venues', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,78 @@
+import pytest
+
+from feeds import ical_line, ical_text
+from pagecache import page_cache, MemoryBackend
+
+def physical_lines(line):
+	folded = ical_line(line)
+	assert folded.endswith('\r\n')
+	return folded[:-2].split('\r\n')
+
+def unfold(lines):
+	return lines[0] + ''.join(line[1:] for line in lines[1:])
+
+#----------------------------------------------------------------------------#
+# Content lines.
+#----------------------------------------------------------------------------#
+
+def test_short_lines_are_not_folded():
+	assert ical_line('SUMMARY:Guns N Petals') == 'SUMMARY:Guns N Petals\r\n'
+
+@pytest.mark.parametrize('line', [
+	'SUMMARY:' + 'x' * 200,
+	'SUMMARY:' + 'é' * 80,
+	'LOCATION:' + 'Café Ñandú 🎸 ' * 12,
+])
+def test_lines_are_folded_at_75_octets(line):
+	lines = physical_lines(line)
+	assert len(lines) > 1
+	assert all(len(part.encode('utf-8')) <= 75 for part in lines)
+	assert all(part.startswith(' ') for part in lines[1:])
+	assert unfold(lines) == line
+
+def test_text_is_escaped():
+	assert ical_text('Rock, Roll; and\\or\nmore') == 'Rock\\, Roll\\; and\\\\or\\nmore'
+
+#----------------------------------------------------------------------------#
+# Feeds.
+#----------------------------------------------------------------------------#
+
+def events(body):
+	return body.replace('\r\n ', '').split('BEGIN:VEVENT')[1:]
+
+@pytest.fixture
+def venue(records):
+	venue, artist = records.venue('The Musical Hop, SF'), records.artist()
+	records.show(venue, artist, days=-7)
+	venue.upcoming = records.show(venue, artist, days=3)
+	return venue
+
+def test_feed_lists_upcoming_shows(client, venue):
+	response = client.get('/venues/%d/calendar.ics' % venue.id)
+	assert response.status_code == 200
+	assert response.mimetype == 'text/calendar'
+	body = response.get_data(as_text=True)
+	assert body.startswith('BEGIN:VCALENDAR\r\n') and body.endswith('END:VCALENDAR\r\n')
+	assert 'X-WR-CALNAME:The Musical Hop\\, SF\r\n' in body
+	event, = events(body)
+	assert 'UID:show-%d@localhost\r\n' % venue.upcoming.id in event
+	assert 'SUMMARY:Guns N Petals at The Musical Hop\\, SF\r\n' in event
+
+def test_feed_not_modified(client, venue):
+	etag = client.get('/venues/%d/calendar.ics' % venue.id).headers['ETag']
+	response = client.get('/venues/%d/calendar.ics' % venue.id, headers={'If-None-Match': etag})
+	assert response.status_code == 304
+	assert response.data == b''
+
+@pytest.mark.parametrize('path', ['/venues/999/calendar.ics', '/artists/999/calendar.ics'])
+def test_feed_not_found(client, records, path):
+	assert client.get(path).status_code == 404
+
+def test_feed_is_cached(client, venue, monkeypatch, statements):
+	monkeypatch.setattr(page_cache, 'backend', MemoryBackend(max_entries=8))
+	first = client.get('/venues/%d/calendar.ics' % venue.id).get_data(as_text=True)
+	with statements() as executed:
+		second = client.get('/venues/%d/calendar.ics' % venue.id).get_data(as_text=True)
+	assert second == first
+	# The version, and nothing to build the feed.
+	assert len(executed) == 1
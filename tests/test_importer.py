@@ -0,0 +1,102 @@
+import io
+import json
+
+import pytest
+
+from importer import read_csv, read_ndjson, read_checkpoint, write_checkpoint, import_records
+from models import Venue, Show
+
+VENUE = {
+	'name': 'The Musical Hop',
+	'city': 'San Francisco',
+	'state': 'CA',
+	'address': '1015 Folsom Street',
+	'phone': '123-123-1234',
+	'genres': ['Jazz', 'Folk'],
+	'seeking_talent': True,
+}
+
+def write_lines(path, lines):
+	path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+	return str(path)
+
+#----------------------------------------------------------------------------#
+# Readers.
+#----------------------------------------------------------------------------#
+
+def test_read_ndjson(tmp_path):
+	path = write_lines(tmp_path / 'venues.ndjson', [json.dumps(VENUE), '', '{"name": ', '[1, 2]'])
+	assert [(line_no, record) for line_no, record, error in read_ndjson(path)] == [(1, VENUE), (3, None), (4, None)]
+	assert list(read_ndjson(path))[2][2] == 'Expected a JSON object.'
+
+def test_read_csv(tmp_path):
+	path = write_lines(tmp_path / 'venues.csv', [
+		'name,city,state,genres,seeking_talent',
+		'The Musical Hop,San Francisco,CA,Jazz; Folk ;,yes',
+		'"Park Square, Live",San Francisco,CA,,No',
+	])
+	records = [record for line_no, record, error in read_csv(path)]
+	assert records[0]['genres'] == ['Jazz', 'Folk']
+	assert records[0]['seeking_talent'] is True
+	assert records[1]['name'] == 'Park Square, Live'
+	assert (records[1]['genres'], records[1]['seeking_talent']) == ([], False)
+
+def test_checkpoint_round_trip(tmp_path):
+	path = str(tmp_path / 'venues.checkpoint.json')
+	assert read_checkpoint(path) == 0
+	write_checkpoint(path, 2000)
+	assert read_checkpoint(path) == 2000
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+def rejects_of(rejects):
+	return [json.loads(line) for line in rejects.getvalue().splitlines()]
+
+def test_invalid_records_are_rejected_by_line(app):
+	records = [
+		(1, dict(VENUE, phone='555'), None),
+		(2, None, 'Expected a JSON object.'),
+		(3, dict(VENUE, state='XX'), None),
+	]
+	rejects = io.StringIO()
+	reports = list(import_records('venues', iter(records), rejects, chunk_size=2))
+	assert [(report['records'], report['rejected'], report['done']) for report in reports] == [(2, 2, 2), (1, 1, 3)]
+	assert [(reject['line'], sorted(reject['errors'])) for reject in rejects_of(rejects)] == [
+		(1, ['phone']), (2, ['record']), (3, ['state'])]
+	assert Venue.query.count() == 0
+
+def test_skips_records_done_by_an_earlier_run(app):
+	records = [(line_no, dict(VENUE, phone='555'), None) for line_no in range(1, 6)]
+	reports = list(import_records('venues', iter(records), io.StringIO(), chunk_size=10, skip=3))
+	assert [(report['records'], report['done']) for report in reports] == [(2, 5)]
+
+@pytest.mark.postgres
+def test_import_command_resumes_from_its_checkpoint(app, records, tmp_path):
+	venue, artist = records.venue(), records.artist()
+	path = write_lines(tmp_path / 'shows.ndjson', [
+		json.dumps({'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-05-21 21:30:00'}),
+		json.dumps({'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-05-21 22:00:00'}),
+		json.dumps({'venue_id': venue.id, 'artist_id': 999, 'start_time': '2035-06-01 20:00:00'}),
+		json.dumps({'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-06-01 20:00:00', 'recurrence': 'FREQ=WEEKLY;COUNT=3'}),
+	])
+	runner = app.test_cli_runner()
+	result = runner.invoke(args=['import', 'shows', path, '--chunk-size', '2'])
+	assert result.exit_code == 0, result.output
+	assert 'Imported 2, rejected 2' in result.output
+	assert Show.query.count() == 4
+	assert [reject['line'] for reject in map(json.loads, open(path + '.rejects.ndjson'))] == [2, 3]
+	result = runner.invoke(args=['import', 'shows', path])
+	assert 'Imported 0, rejected 0' in result.output
+	assert Show.query.count() == 4
+
+@pytest.mark.postgres
+def test_repeated_records_are_rejected(app, records, tmp_path):
+	venue, artist = records.venue(), records.artist()
+	show = json.dumps({'venue_id': venue.id, 'artist_id': artist.id, 'start_time': '2035-05-21 21:30:00'})
+	rejects = io.StringIO()
+	reports = list(import_records('shows', read_ndjson(write_lines(tmp_path / 'shows.ndjson', [show, show])), rejects))
+	assert [(report['imported'], report['rejected']) for report in reports] == [(1, 1)]
+	assert [reject['line'] for reject in rejects_of(rejects)] == [2]
+	assert Show.query.count() == 1
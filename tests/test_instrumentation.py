@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+def test_failed_statements_leave_the_connection_clean(app):
+	with db.engine.connect() as conn:
+		info = repr(conn.info)
+		for _ in range(3):
+			with pytest.raises(OperationalError):
+				conn.execute(text('SELECT * FROM "No_such_table"'))
+		assert conn.execute(text('SELECT 1')).scalar() == 1
+		assert repr(conn.info) == info
+
+def test_server_timing_counts_statements(client, records, statements):
+	venue = records.venue()
+	client.get('/venues/%d' % venue.id)
+	with statements() as executed:
+		response = client.get('/venues/%d' % venue.id)
+	assert 'desc="%d SQL"' % len(executed) in response.headers['Server-Timing']
@@ -0,0 +1,26 @@
+import pytest
+
+TOKEN = 's3cret'
+
+@pytest.fixture
+def token(app, monkeypatch):
+	monkeypatch.setitem(app.config, 'INTERNAL_TOKEN', TOKEN)
+	return TOKEN
+
+# The test client's requests come from 127.0.0.1, as they would through a
+# proxy on the same host.
+@pytest.mark.parametrize('path', ['/internal/pool', '/metrics'])
+def test_loopback_needs_the_token(client, token, path):
+	assert client.get(path).status_code == 404
+	assert client.get(path, headers={'Authorization': 'Bearer wrong'}).status_code == 404
+	assert client.get(path, headers={'Authorization': 'Bearer ' + token}).status_code == 200
+
+@pytest.mark.parametrize('path', ['/internal/pool', '/metrics'])
+def test_closed_without_a_token(client, path):
+	assert client.get(path).status_code == 404
+	assert client.get(path, headers={'Authorization': 'Bearer '}).status_code == 404
+
+def test_loopback_trust_is_opt_in(app, client, monkeypatch):
+	monkeypatch.setitem(app.config, 'INTERNAL_TRUST_LOOPBACK', True)
+	assert client.get('/internal/pool').status_code == 200
+	assert client.get('/internal/pool', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 404
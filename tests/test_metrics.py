@@ -0,0 +1,31 @@
+import json
+import threading
+
+from metrics import Metrics
+
+def test_flush_outside_an_app_context(app, tmp_path, monkeypatch):
+	monkeypatch.setitem(app.config, 'METRICS_DIR', str(tmp_path))
+	monkeypatch.setitem(app.config, 'METRICS_FLUSH_SECONDS', 0)
+	metrics = Metrics()
+	metrics.init_app(app)
+	errors = []
+	# As asgi.py's handlers do, from a thread with no Flask context.
+	def observe():
+		try:
+			metrics.observe('show_venue', 'GET', 200, 0.02)
+		except Exception as e:
+			errors.append(e)
+	thread = threading.Thread(target=observe)
+	thread.start()
+	thread.join()
+	assert errors == []
+	snapshot, = [json.loads(path.read_text()) for path in tmp_path.glob('*.json')]
+	assert snapshot['requests'] == [['show_venue', 'GET', 200, 1]]
+	assert 'primary' in snapshot['pools']
+
+def test_metrics_endpoint(client, app, monkeypatch):
+	monkeypatch.setitem(app.config, 'INTERNAL_TOKEN', 's3cret')
+	client.get('/venues')
+	body = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).get_data(as_text=True)
+	assert 'fyyur_requests_total{endpoint="venues",method="GET",status="200"}' in body
+	assert 'fyyur_db_pool_size' in body
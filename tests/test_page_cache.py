@@ -0,0 +1,145 @@
+import types
+from datetime import datetime, timedelta
+
+import pytest
+
+import pagecache
+from pagecache import MemoryBackend, RedisBackend, page_cache
+
+class Clock(object):
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+	def advance(self, seconds):
+		self.now += seconds
+
+# Stands in for redis.Redis: bytes values, expiry in seconds with `ex`.
+class FakeRedis(object):
+	def __init__(self, clock):
+		self.clock = clock
+		self.values = {}
+
+	def get(self, key):
+		value, expires = self.values.get(key, (None, None))
+		if expires is not None and expires <= self.clock():
+			del self.values[key]
+			return None
+		return value
+
+	def set(self, key, value, ex=None):
+		self.values[key] = (value.encode('utf-8'), self.clock() + ex if ex else None)
+		return True
+
+	def delete(self, *keys):
+		return len([key for key in keys if self.values.pop(key, None) is not None])
+
+@pytest.fixture
+def clock(monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(pagecache, 'time', types.SimpleNamespace(monotonic=clock))
+	return clock
+
+@pytest.fixture(params=['memory', 'redis'])
+def backend(request, clock):
+	if request.param == 'memory':
+		return MemoryBackend(max_entries=8)
+	return RedisBackend(FakeRedis(clock))
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+def test_entries_expire(backend, clock):
+	backend.set('venue:1', 'page', 60)
+	clock.advance(59)
+	assert backend.get('venue:1') == 'page'
+	clock.advance(1)
+	assert backend.get('venue:1') is None
+
+def test_delete(backend):
+	backend.set('venue:1', 'one', 60)
+	backend.set('venue:2', 'two', 60)
+	backend.delete('venue:1', 'artist:9')
+	assert backend.get('venue:1') is None
+	assert backend.get('venue:2') == 'two'
+
+def test_memory_backend_evicts_least_recently_used(clock):
+	backend = MemoryBackend(max_entries=2)
+	backend.set('venue:1', 'one', 60)
+	backend.set('venue:2', 'two', 60)
+	backend.get('venue:1')
+	backend.set('venue:3', 'three', 60)
+	assert backend.get('venue:2') is None
+	assert backend.get('venue:1') == 'one'
+
+def test_redis_backend_prefixes_keys(clock):
+	client = FakeRedis(clock)
+	RedisBackend(client).set('venue:1', 'page', 1.5)
+	assert client.values == {'fyyur:page:venue:1': (b'page', clock() + 1)}
+
+def test_lifetime_is_capped(app, backend, clock, monkeypatch):
+	monkeypatch.setattr(page_cache, 'backend', backend)
+	page_cache.set('venue:1', 'page', expires_in=30)
+	page_cache.set('venue:2', 'page', expires_in=0)
+	page_cache.set('calendar:venue:1', 'feed', ttl=3600)
+	clock.advance(30)
+	assert page_cache.get('venue:1') is None
+	assert page_cache.get('venue:2') is None
+	assert page_cache.get('calendar:venue:1') == 'feed'
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+@pytest.fixture
+def cached(app, backend, monkeypatch):
+	monkeypatch.setattr(page_cache, 'backend', backend)
+	monkeypatch.setattr(page_cache, 'hits', 0)
+	monkeypatch.setattr(page_cache, 'misses', 0)
+	return backend
+
+def test_detail_page_hit(client, records, cached, statements):
+	venue = records.venue()
+	first = client.get('/venues/%d' % venue.id)
+	with statements() as executed:
+		second = client.get('/venues/%d' % venue.id)
+	assert (page_cache.misses, page_cache.hits) == (1, 1)
+	assert second.data == first.data
+	# Only the version statement runs on a hit.
+	assert len(executed) == 1
+
+def test_detail_page_expires_when_a_show_starts(client, records, cached, clock):
+	venue, artist = records.venue(), records.artist()
+	records.show(venue, artist, days=timedelta(minutes=5) / timedelta(days=1))
+	client.get('/venues/%d' % venue.id)
+	clock.advance(290)
+	client.get('/venues/%d' % venue.id)
+	assert page_cache.hits == 1
+	clock.advance(11)
+	client.get('/venues/%d' % venue.id)
+	assert page_cache.misses == 2
+
+def test_edit_invalidates_venue_and_artist_pages(client, records, cached):
+	venue, artist = records.venue(), records.artist()
+	records.show(venue, artist)
+	client.get('/venues/%d' % venue.id)
+	client.get('/artists/%d' % artist.id)
+	assert cached.get('venue:%d' % venue.id) is not None
+	client.post('/venues/%d/edit' % venue.id, data=records.venue_form('The Renamed Hop'))
+	assert cached.get('venue:%d' % venue.id) is None
+	assert cached.get('artist:%d' % artist.id) is None
+	assert b'The Renamed Hop' in client.get('/venues/%d' % venue.id).data
+	assert b'The Renamed Hop' in client.get('/artists/%d' % artist.id).data
+
+@pytest.mark.postgres
+def test_new_show_invalidates_both_pages(client, records, cached):
+	venue, artist = records.venue(), records.artist()
+	client.get('/venues/%d' % venue.id)
+	client.get('/artists/%d' % artist.id)
+	start_time = (datetime.now() + timedelta(days=3)).strftime('%Y-%m-%d %H:%M:%S')
+	client.post('/shows/create', data={'venue_id': venue.id, 'artist_id': artist.id, 'start_time': start_time})
+	assert cached.get('venue:%d' % venue.id) is None
+	assert cached.get('artist:%d' % artist.id) is None
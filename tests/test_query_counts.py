@@ -0,0 +1,40 @@
+import pytest
+
+# The listing and detail pages run a fixed number of statements however many
+# shows they list; a count that grows with the rows is an N+1 pattern. Each
+# page is requested once before counting, which warms the per-process caches.
+
+def statement_count(client, statements, path):
+	client.get(path)
+	with statements() as executed:
+		response = client.get(path)
+	assert response.status_code == 200
+	return len(executed)
+
+@pytest.fixture
+def venues(records):
+	artists = [records.artist('Artist %d' % i) for i in range(10)]
+	small, large = records.venue('Small Hall'), records.venue('Large Hall')
+	records.show(small, artists[0])
+	for days, artist in enumerate(artists, 1):
+		records.show(large, artist, days)
+	return small, large, artists
+
+def test_shows_listing(client, records, statements):
+	venue, artist = records.venue(), records.artist()
+	records.show(venue, artist)
+	one = statement_count(client, statements, '/shows')
+	for days in range(2, 21):
+		records.show(venue, artist, days)
+	assert statement_count(client, statements, '/shows') == one
+
+def test_venue_page(client, venues, statements):
+	small, large, artists = venues
+	assert statement_count(client, statements, '/venues/%d' % large.id) == statement_count(client, statements, '/venues/%d' % small.id)
+
+def test_artist_page(client, records, venues, statements):
+	small, large, artists = venues
+	busy = records.artist('Busy Artist')
+	for days in range(1, 11):
+		records.show(records.venue('Venue %d' % days), busy, days)
+	assert statement_count(client, statements, '/artists/%d' % busy.id) == statement_count(client, statements, '/artists/%d' % artists[1].id)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import forms
+from queries import show_series
+from recurrence import MAX_OCCURRENCES, occurrences
+
+START = datetime(2035, 5, 21, 21, 30)
+
+def test_daily():
+	assert occurrences('FREQ=DAILY;COUNT=3', START) == [START + timedelta(days=n) for n in range(3)]
+
+def test_weekly_on_several_days():
+	starts = occurrences('FREQ=WEEKLY;BYDAY=MO,TU;COUNT=4', START)
+	assert [start.strftime('%a %d') for start in starts] == ['Mon 21', 'Tue 22', 'Mon 28', 'Tue 29']
+
+@pytest.mark.parametrize('rule', [
+	'FREQ=HOURLY;COUNT=3',
+	'freq=minutely;COUNT=3',
+	'FREQ=DAILY;BYHOUR=18,21;COUNT=4',
+	'FREQ=WEEKLY;BYDAY=MO;BYHOUR=18,21;COUNT=4',
+])
+def test_more_than_daily(rule):
+	with pytest.raises(ValueError, match='at most daily'):
+		occurrences(rule, START)
+
+@pytest.mark.parametrize('rule, message', [
+	('FREQ=DAILY', 'at most %d shows' % MAX_OCCURRENCES),
+	('FREQ=DAILY;UNTIL=20300101T000000', 'no occurrences'),
+	('FREQ=FORTNIGHTLY', 'Not a valid recurrence rule'),
+])
+def test_invalid_rules(rule, message):
+	with pytest.raises(ValueError, match=message):
+		occurrences(rule, START)
+
+#----------------------------------------------------------------------------#
+# Show forms.
+#----------------------------------------------------------------------------#
+
+def test_form_rejects_a_bad_rule(records):
+	form = records.show_form(recurrence='FREQ=DAILY;BYHOUR=18,21')
+	assert not form.validate()
+	assert form.errors['recurrence'] == ['Shows can repeat at most daily.']
+
+def test_rule_is_expanded_once(records, monkeypatch):
+	calls = []
+	def counted(rule, start):
+		calls.append(rule)
+		return occurrences(rule, start)
+	monkeypatch.setattr(forms, 'occurrences', counted)
+	form = records.show_form(recurrence='FREQ=WEEKLY;COUNT=3', duration=90)
+	assert form.validate(), form.errors
+	rows = show_series(form.data)
+	assert calls == ['FREQ=WEEKLY;COUNT=3']
+	assert [(row['start_time'], row['end_time'] - row['start_time']) for row in rows] == [
+		(START + timedelta(weeks=n), timedelta(minutes=90)) for n in range(3)]
+
+def test_show_without_a_rule(records):
+	form = records.show_form(recurrence='  ')
+	assert form.validate(), form.errors
+	assert [row['start_time'] for row in show_series(form.data)] == [START]
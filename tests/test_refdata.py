@@ -0,0 +1,31 @@
+import pytest
+
+from models import db
+from refdata import reference_cache, db_add_genre
+
+def test_lookup_survives_concurrent_invalidation(records, monkeypatch):
+	warm = reference_cache.warm
+	def warm_then_invalidate():
+		maps = warm()
+		reference_cache.invalidate()
+		return maps
+	monkeypatch.setattr(reference_cache, 'warm', warm_then_invalidate)
+	assert reference_cache.genre_id('Jazz') == records.genre.id
+	assert reference_cache.city(records.city.id) == ('San Francisco', 'CA')
+
+@pytest.mark.postgres
+def test_new_genres_invalidate_after_commit(records):
+	assert reference_cache.genre_id('Jazz') == records.genre.id
+	genre_id, = db_add_genre(['Swing'])
+	assert reference_cache.genre_ids is not None
+	db.session.commit()
+	assert reference_cache.genre_ids is None
+	assert reference_cache.genre_id('Swing') == genre_id
+
+@pytest.mark.postgres
+def test_rolled_back_genres_keep_the_cache(records):
+	assert reference_cache.genre_id('Jazz') == records.genre.id
+	db_add_genre(['Swing'])
+	db.session.rollback()
+	assert reference_cache.genre_ids is not None
+	assert reference_cache.genre_id('Swing') is None
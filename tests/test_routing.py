@@ -0,0 +1,81 @@
+import shutil
+import time
+import types
+
+import pytest
+
+import routing
+from models import db
+from refdata import reference_cache
+from routing import REPLICA
+
+# The replica is a second SQLite file, refreshed from the primary by
+# `replicate`, so anything written since is visible on the primary only.
+
+@pytest.fixture
+def binds(tmp_path):
+	return {REPLICA: 'sqlite:///%s' % (tmp_path / 'replica.db')}
+
+@pytest.fixture
+def replicate(app, database_url, binds):
+	def replicate():
+		for bind in (None, REPLICA):
+			db.get_engine(bind=bind).dispose()
+		shutil.copyfile(database_url[len('sqlite:///'):], binds[REPLICA][len('sqlite:///'):])
+	return replicate
+
+@pytest.fixture
+def engines(client, statements):
+	# Reference data is always loaded from the primary, so that it is never
+	# older than the commit that invalidated it. Load it up front, along with
+	# the process's first request, which loads it again.
+	client.get('/')
+	reference_cache.warm()
+	def engines():
+		return statements(), statements(db.get_engine(bind=REPLICA))
+	return engines
+
+def test_export_streams_from_the_replica(client, records, replicate, engines):
+	records.show(records.venue(), records.artist())
+	replicate()
+	primary, replica = engines()
+	with primary as on_primary, replica as on_replica:
+		body = client.get('/shows/export.ndjson').data
+	assert b'The Musical Hop' in body
+	assert on_primary == []
+	assert on_replica != []
+
+def test_read_only_views_read_the_replica(client, records, replicate, engines):
+	venue = records.venue()
+	replicate()
+	primary, replica = engines()
+	with primary as on_primary, replica as on_replica:
+		assert b'The Musical Hop' in client.get('/venues').data
+		assert b'The Musical Hop' in client.get('/venues/%d' % venue.id).data
+	assert on_primary == []
+	assert on_replica != []
+
+def test_reads_follow_writes_to_the_primary(app, client, records, replicate, engines, monkeypatch):
+	venue = records.venue()
+	replicate()
+	primary, replica = engines()
+	with primary as on_primary, replica as on_replica:
+		client.post('/venues/%d/edit' % venue.id, data=records.venue_form('The Renamed Hop'))
+	assert any(statement.startswith('UPDATE "Venue"') for statement in on_primary)
+	assert on_replica == []
+
+	# Until the replica has had time to catch up, this user reads their own
+	# write from the primary.
+	primary, replica = engines()
+	with primary as on_primary, replica as on_replica:
+		assert b'The Renamed Hop' in client.get('/venues/%d' % venue.id).data
+	assert on_primary != []
+	assert on_replica == []
+
+	later = time.time() + app.config['READ_YOUR_WRITES_SECONDS'] + 1
+	monkeypatch.setattr(routing, 'time', types.SimpleNamespace(time=lambda: later))
+	primary, replica = engines()
+	with primary as on_primary, replica as on_replica:
+		assert b'The Musical Hop' in client.get('/venues/%d' % venue.id).data
+	assert on_primary == []
+	assert on_replica != []
@@ -0,0 +1,66 @@
+import pytest
+
+from models import Venue, Artist, Venue_genre, Artist_genre
+from queries import db_search
+
+def search_venues(term):
+	return db_search(Venue, Venue_genre, Venue_genre.c.venue_id, term)
+
+@pytest.fixture
+def venues(records):
+	records.venue('The Musical Hop')
+	records.venue('Park Square Live Music & Coffee')
+	records.venue('The Dueling Pianos Bar')
+
+def test_matches_name_case_insensitively(venues):
+	result = search_venues('music')
+	assert sorted(venue['name'] for venue in result['data']) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+	assert result['count'] == 2
+	assert not result['more']
+
+def test_matches_city_and_state(venues):
+	assert search_venues('San Francisco, CA')['count'] == 3
+	assert search_venues('Francisco, NY')['count'] == 0
+
+def test_matches_genre(records):
+	records.artist('Guns N Petals')
+	result = db_search(Artist, Artist_genre, Artist_genre.c.artist_id, 'jazz')
+	assert [artist['name'] for artist in result['data']] == ['Guns N Petals']
+
+def test_empty_terms_match_nothing(venues, statements):
+	with statements() as executed:
+		for term in ('', '  '):
+			assert search_venues(term) == {'count': 0, 'more': False, 'data': []}
+	assert executed == []
+
+def test_short_terms_match_state_codes(venues):
+	assert search_venues('CA')['count'] == 3
+	assert search_venues('ca')['count'] == 3
+	# Only whole codes: "C" is not a state, and no venue name starts with it.
+	assert search_venues('C')['count'] == 0
+
+def test_short_terms_match_name_prefixes(records, venues):
+	records.artist('U2')
+	records.artist('Guns N Petals')
+	result = db_search(Artist, Artist_genre, Artist_genre.c.artist_id, 'u2')
+	assert [artist['name'] for artist in result['data']] == ['U2']
+	assert sorted(venue['name'] for venue in search_venues('Th')['data']) == ['The Dueling Pianos Bar', 'The Musical Hop']
+
+def test_name_matches_are_counted_first(app, records, monkeypatch):
+	records.artist('Guns N Petals')
+	records.artist('Jazz Hands')
+	monkeypatch.setitem(app.config, 'SEARCH_COUNT_LIMIT', 1)
+	result = db_search(Artist, Artist_genre, Artist_genre.c.artist_id, 'jazz')
+	assert [artist['name'] for artist in result['data']] == ['Jazz Hands']
+	assert result['more']
+
+def test_count_is_capped(app, venues, monkeypatch):
+	monkeypatch.setitem(app.config, 'SEARCH_COUNT_LIMIT', 2)
+	result = search_venues('San Francisco')
+	assert result['count'] == 2
+	assert result['more']
+
+def test_search_page(client, venues):
+	response = client.post('/venues/search', data={'search_term': 'hop'})
+	assert b'Number of search results for "hop": 1</h3>' in response.data
+	assert b'The Musical Hop' in response.data
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Show, Venue_show_summary, Artist_show_summary, db
+from queries import db_create_show
+from summaries import db_count_shows, roll_show_summaries
+
+def counters(summary, entity_id):
+	key = list(summary.c)[0]
+	row = db.session.execute(summary.select().where(key == entity_id)).first()
+	return row and (row.upcoming_shows, row.past_shows, row.next_show_time)
+
+def set_counters(summary, entity_id, upcoming_shows, past_shows, next_show_time):
+	db.session.execute(summary.insert().values({
+		list(summary.c)[0].key: entity_id,
+		'upcoming_shows': upcoming_shows,
+		'past_shows': past_shows,
+		'next_show_time': next_show_time,
+	}))
+	db.session.commit()
+
+def remove(show):
+	db.session.execute(Show.__table__.delete().where(Show.id == show.id))
+	db_count_shows([{'venue_id': show.venue_id, 'artist_id': show.artist_id, 'start_time': show.start_time}], removed=True)
+	db.session.commit()
+
+# An artist with a show that started an hour ago, which their counters have
+# not been rolled past yet, and one tomorrow at another venue.
+@pytest.fixture
+def stale(records):
+	venue, other_venue, artist = records.venue(), records.venue('Park Square Live Music & Coffee'), records.artist()
+	started = records.show(venue, artist, days=-1 / 24)
+	tomorrow = records.show(other_venue, artist, days=1)
+	set_counters(Artist_show_summary, artist.id, 2, 0, started.start_time)
+	set_counters(Venue_show_summary, other_venue.id, 1, 0, tomorrow.start_time)
+	return artist, started, tomorrow
+
+def test_removing_shows_from_a_stale_row(stale):
+	artist, started, tomorrow = stale
+	remove(tomorrow)
+	assert counters(Artist_show_summary, artist.id) == (0, 1, None)
+	assert counters(Venue_show_summary, tomorrow.venue_id) == (0, 0, None)
+
+def test_listing_after_removing_shows_from_a_stale_row(client, stale):
+	artist, started, tomorrow = stale
+	remove(tomorrow)
+	assert b'0 upcoming shows' in client.get('/artists').data
+
+def test_listing_recounts_stale_rows(client, stale):
+	assert b'1 upcoming show<' in client.get('/artists').data
+
+def test_roll(stale):
+	artist, started, tomorrow = stale
+	assert roll_show_summaries() == 1
+	assert counters(Artist_show_summary, artist.id) == (1, 1, tomorrow.start_time)
+	# Rolled rows are current until their next show starts.
+	assert roll_show_summaries() == 0
+	assert roll_show_summaries(tomorrow.start_time + timedelta(minutes=1)) == 2
+	assert counters(Artist_show_summary, artist.id) == (0, 2, None)
+
+#----------------------------------------------------------------------------#
+# Inserts (Postgres upserts).
+#----------------------------------------------------------------------------#
+
+def create_show(venue, artist, start_time):
+	db_create_show({'venue_id': venue.id, 'artist_id': artist.id, 'start_time': start_time})
+	db.session.commit()
+	return start_time
+
+@pytest.mark.postgres
+def test_creating_shows(records):
+	venue, artist = records.venue(), records.artist()
+	now = datetime.now().replace(microsecond=0)
+	create_show(venue, artist, now + timedelta(days=7))
+	sooner = create_show(venue, artist, now + timedelta(days=2))
+	create_show(venue, artist, now - timedelta(days=2))
+	assert counters(Venue_show_summary, venue.id) == (2, 1, sooner)
+	assert counters(Artist_show_summary, artist.id) == (2, 1, sooner)
+
+@pytest.mark.postgres
+def test_creating_shows_keeps_a_stale_row_stale(records, stale):
+	artist, started, tomorrow = stale
+	create_show(records.venue('The Dueling Pianos Bar'), artist, tomorrow.start_time + timedelta(days=1))
+	assert counters(Artist_show_summary, artist.id)[2] == started.start_time
+	assert roll_show_summaries() >= 1
+	assert counters(Artist_show_summary, artist.id) == (2, 1, tomorrow.start_time)
+
+@pytest.mark.postgres
+def test_deleting_a_venue(client, stale):
+	artist, started, tomorrow = stale
+	assert client.delete('/venues/%d' % tomorrow.venue_id).status_code == 200
+	assert counters(Artist_show_summary, artist.id) == (0, 1, None)
+	assert b'0 upcoming shows' in client.get('/artists').data